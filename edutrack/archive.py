@@ -0,0 +1,166 @@
+"""Cold storage for closed academic years.
+
+Each (school, academic year) pair gets its own SQLite file under
+ARCHIVE_DIR. Rows are stored compactly: the eight attendance hour flags
+are packed into one integer and long free-text columns are zlib
+compressed. Archives are opened read-only for historical views and
+exports.
+"""
+import os
+import sqlite3
+import zlib
+from datetime import date
+
+DEFAULT_YEAR_START_MONTH = 6
+
+ARCHIVE_SCHEMA = {
+    'attendance': ('id', 'student_id', 'date', 'hours', 'created_at'),
+    'grade': ('id', 'student_id', 'subject', 'grade', 'marks', 'semester', 'created_at'),
+    'leave_request': ('id', 'student_id', 'parent_id', 'teacher_id', 'leave_type', 'start_date',
+                      'end_date', 'reason', 'status', 'teacher_comment', 'created_at'),
+    'message': ('id', 'sender_id', 'receiver_id', 'student_id', 'content', 'timestamp', 'is_read'),
+}
+COMPRESSED_COLUMNS = {'reason', 'teacher_comment', 'content'}
+ORDER_COLUMNS = {
+    'attendance': 'date',
+    'grade': 'created_at',
+    'leave_request': 'created_at',
+    'message': 'timestamp',
+}
+
+
+def academic_year_label(start_year):
+    """2024 -> '2024-25'"""
+    return f'{start_year}-{(start_year + 1) % 100:02d}'
+
+
+def parse_academic_year(label):
+    """'2024-25' -> 2024, or None if label is not an academic year"""
+    try:
+        start, end = label.split('-')
+        start_year = int(start)
+    except (AttributeError, ValueError):
+        return None
+    if len(start) != 4 or end != f'{(start_year + 1) % 100:02d}':
+        return None
+    return start_year
+
+
+def academic_year_bounds(start_year, start_month=DEFAULT_YEAR_START_MONTH):
+    """First day of the academic year and first day of the next one"""
+    return date(start_year, start_month, 1), date(start_year + 1, start_month, 1)
+
+
+def pack_hours(flags):
+    return sum(1 << i for i, present in enumerate(flags) if present)
+
+
+def unpack_hours(mask, count=8):
+    return [bool(mask & (1 << i)) for i in range(count)]
+
+
+def _encode(column, value):
+    if value is None:
+        return None
+    if column in COMPRESSED_COLUMNS:
+        return zlib.compress(value.encode('utf-8'), 9)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _decode(column, value):
+    if value is not None and column in COMPRESSED_COLUMNS:
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+class ArchiveStore:
+    """One academic year's archive database"""
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._conn = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def connection(self):
+        if self._conn is None:
+            if self.readonly:
+                self._conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            else:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._conn = sqlite3.connect(self.path)
+                self._create_schema()
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _create_schema(self):
+        for table, columns in ARCHIVE_SCHEMA.items():
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                               f'(id INTEGER PRIMARY KEY, {", ".join(columns[1:])})')
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_student '
+                               f'ON {table} (student_id, {ORDER_COLUMNS[table]})')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._conn.commit()
+
+    def write(self, table, rows):
+        """Insert rows (dicts keyed by ARCHIVE_SCHEMA columns) and commit.
+
+        Re-archiving a row replaces it, so an interrupted batch can simply
+        be run again.
+        """
+        columns = ARCHIVE_SCHEMA[table]
+        placeholders = ', '.join('?' for _ in columns)
+        conn = self.connection()
+        conn.executemany(
+            f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+            [tuple(_encode(column, row.get(column)) for column in columns) for row in rows])
+        conn.commit()
+
+    def read(self, table, student_id=None):
+        """Rows of table as dicts, optionally for one student, oldest first"""
+        if not self.exists():
+            return []
+        sql = f'SELECT * FROM {table}'
+        params = ()
+        if student_id is not None:
+            sql += ' WHERE student_id = ?'
+            params = (student_id,)
+        sql += f' ORDER BY {ORDER_COLUMNS[table]}, id'
+        rows = self.connection().execute(sql, params).fetchall()
+        return [{key: _decode(key, row[key]) for key in row.keys()} for row in rows]
+
+    def count(self, table):
+        if not self.exists():
+            return 0
+        return self.connection().execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def set_meta(self, key, value):
+        conn = self.connection()
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+        conn.commit()
+
+    def get_meta(self, key):
+        if not self.exists():
+            return None
+        row = self.connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def vacuum(self):
+        self.connection().execute('VACUUM')
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def list_archived_years(directory):
+    """Academic year labels that have an archive in directory, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    labels = [name[:-3] for name in os.listdir(directory) if name.endswith('.db')]
+    return sorted((label for label in labels if parse_academic_year(label) is not None), reverse=True)
@@ -0,0 +1,139 @@
+"""Academic-year archival jobs and the ``flask archive`` commands.
+
+Closed academic years of attendance, grades, leave requests and messages
+are moved in small batches into a per-year archive database (see
+archive.py), keeping the hot tables small. Each batch is written to the
+archive before it is deleted from the main database, so an interrupted run
+can be restarted.
+"""
+import json
+import os
+import threading
+import time as time_module
+from datetime import datetime, date, time
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup
+from sqlalchemy import inspect
+
+from archive import ArchiveStore, academic_year_bounds, academic_year_label, pack_hours, parse_academic_year
+from models import db, Attendance, Grade, LeaveRequest, Message, bump_student_versions
+from schools import school_exists
+from tenancy import DEFAULT_SCHOOL, current_school_slug
+
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.05  # seconds between batches, lets other writers in
+
+ARCHIVED_MODELS = (
+    (Attendance, Attendance.date, 'attendance'),
+    (Grade, Grade.created_at, 'grade'),
+    (LeaveRequest, LeaveRequest.end_date, 'leave_request'),
+    (Message, Message.timestamp, 'message'),
+)
+
+archive_jobs = {}
+archive_jobs_lock = threading.Lock()
+
+def archive_dir(school=None):
+    base = current_app.config.get('ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+    return os.path.join(base, school or current_school_slug())
+
+def archive_store(start_year, readonly=True):
+    path = os.path.join(archive_dir(), f'{academic_year_label(start_year)}.db')
+    return ArchiveStore(path, readonly=readonly)
+
+def current_year_bounds(start_year):
+    return academic_year_bounds(start_year, current_app.config.get('ACADEMIC_YEAR_START_MONTH', 6))
+
+def is_closed_year(start_year):
+    return current_year_bounds(start_year)[1] <= date.today()
+
+def archive_row(obj):
+    """Column values of an archived model instance, in archive form"""
+    row = {column.key: getattr(obj, column.key) for column in inspect(obj).mapper.column_attrs}
+    if isinstance(obj, Attendance):
+        row['hours'] = pack_hours(getattr(obj, f'hour_{h}') for h in range(1, 9))
+    return row
+
+def archive_academic_year(start_year, batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_BATCH_PAUSE, progress=None):
+    """Move a closed academic year into its archive database and return row counts"""
+    if not is_closed_year(start_year):
+        raise ValueError(f'Academic year {academic_year_label(start_year)} is not over yet')
+    start, end = current_year_bounds(start_year)
+    store = archive_store(start_year, readonly=False)
+    counts = {}
+    try:
+        for model, column, table in ARCHIVED_MODELS:
+            lower, upper = start, end
+            if isinstance(column.type, db.DateTime):
+                lower, upper = datetime.combine(start, time.min), datetime.combine(end, time.min)
+            counts[table] = 0
+            while True:
+                rows = model.query.filter(column >= lower, column < upper).order_by(model.id).limit(batch_size).all()
+                if not rows:
+                    break
+                store.write(table, [archive_row(r) for r in rows])
+                student_ids = sorted({r.student_id for r in rows})
+                model.query.filter(model.id.in_([r.id for r in rows])).delete(synchronize_session=False)
+                # Archived rows drop out of dashboards and API responses
+                bump_student_versions(db.session.connection(), student_ids)
+                db.session.commit()
+                counts[table] += len(rows)
+                if progress:
+                    progress(table, counts[table])
+                time_module.sleep(pause)
+        store.set_meta('archived_at', datetime.utcnow().isoformat())
+        store.vacuum()
+    finally:
+        store.close()
+    return counts
+
+def start_archive_job(start_year):
+    """Archive an academic year in a background thread; returns False if already running"""
+    app = current_app._get_current_object()
+    school = current_school_slug()
+    key = (school, academic_year_label(start_year))
+    with archive_jobs_lock:
+        job = archive_jobs.get(key)
+        if job and job['state'] == 'running':
+            return False
+        job = archive_jobs[key] = {'state': 'running', 'counts': {}, 'error': None}
+
+    def progress(table, count):
+        job['counts'][table] = count
+
+    def run():
+        with app.app_context():
+            g.school = school
+            try:
+                job['counts'] = archive_academic_year(start_year, progress=progress)
+                job['state'] = 'done'
+            except Exception as e:
+                db.session.rollback()
+                job['state'] = 'failed'
+                job['error'] = str(e)
+
+    threading.Thread(target=run, name=f'archive-{school}-{key[1]}', daemon=True).start()
+    return True
+
+archive_cli = AppGroup('archive', help='Move closed academic years into cold storage.')
+
+@archive_cli.command('run')
+@click.argument('year')
+@click.option('--school', default=DEFAULT_SCHOOL, show_default=True, help='School code.')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, show_default=True)
+def archive_run_command(year, school, batch_size):
+    """Archive academic year YEAR (e.g. 2023-24) in the foreground."""
+    start_year = parse_academic_year(year)
+    if start_year is None:
+        raise click.BadParameter('expected an academic year such as 2023-24', param_hint='YEAR')
+    if not school_exists(school):
+        raise click.BadParameter(f'unknown school {school}', param_hint='--school')
+    g.school = school
+    try:
+        counts = archive_academic_year(start_year, batch_size=batch_size,
+                                       progress=lambda table, n: click.echo(f'{table}: {n}'))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(counts))
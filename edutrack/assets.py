@@ -0,0 +1,174 @@
+"""Fingerprinted, precompressed static assets and response compression.
+
+Templates reference static files through ``asset_url('css/style.css')``,
+which returns a URL containing a hash of the file contents, e.g.
+``/assets/css/style.3f9a1c2b7d4e.css``. Because the URL changes whenever the
+file changes, those responses are served with a one-year immutable
+Cache-Control header. Every static file is hashed and compressed (gzip, and
+brotli when the ``brotli`` package is installed) when the app is created,
+so no request pays for compression; the best encoding the client accepts
+is sent, each with its own ETag.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import abort, request, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+HASH_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Only text formats benefit from compression
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+MIN_COMPRESS_SIZE = 500
+
+
+class Asset:
+    """A static file with its content hash and precompressed variants"""
+
+    def __init__(self, path, mtime, data):
+        self.path = path
+        self.mtime = mtime
+        self.digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.encodings = {'identity': data}
+        if self.mimetype in COMPRESSIBLE_MIMETYPES:
+            self.encodings['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(data, quality=11)
+
+    def hashed_name(self, filename):
+        root, ext = os.path.splitext(filename)
+        return f'{root}.{self.digest}{ext}'
+
+
+class AssetManifest:
+    """Map of static filenames to fingerprinted assets"""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def preload(self):
+        """Build every static file's asset up front"""
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                filename = os.path.relpath(os.path.join(root, name), self.static_folder)
+                self.get(filename.replace(os.sep, '/'))
+
+    def get(self, filename, reload=False):
+        """Return the Asset for filename, or None if it is not a static file.
+
+        With reload, the file's mtime is checked so edits are picked up
+        without a restart (used in debug mode).
+        """
+        asset = self._assets.get(filename)
+        if asset is not None and not reload:
+            return asset
+
+        path = os.path.realpath(os.path.join(self.static_folder, filename))
+        if not path.startswith(os.path.realpath(self.static_folder) + os.sep) or not os.path.isfile(path):
+            return None
+        mtime = os.path.getmtime(path)
+        if asset is not None and asset.mtime == mtime:
+            return asset
+
+        with self._lock:
+            with open(path, 'rb') as f:
+                asset = Asset(path, mtime, f.read())
+            self._assets[filename] = asset
+        return asset
+
+
+def choose_encoding(asset):
+    """Pick the best encoding of asset that the client accepts"""
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.encodings and request.accept_encodings[encoding]:
+            return encoding
+    return 'identity'
+
+
+def split_hashed_name(filename):
+    """Turn 'css/style.<hash>.css' back into ('css/style.css', '<hash>')"""
+    root, ext = os.path.splitext(filename)
+    root, _, digest = root.rpartition('.')
+    if not root or len(digest) != HASH_LENGTH:
+        return None, None
+    return root + ext, digest
+
+
+def compress_response(response):
+    """Gzip dynamic text responses when the client accepts it"""
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    # The compressed body is only semantically equal to the original
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_assets(app):
+    """Register the asset route, the asset_url template helper and compression"""
+    manifest = AssetManifest(app.static_folder)
+    # Compress now (before any worker forks) rather than in the request path
+    manifest.preload()
+    app.extensions['assets'] = manifest
+
+    def asset_url(filename):
+        asset = manifest.get(filename, reload=app.debug)
+        if asset is None:
+            return url_for('static', filename=filename)
+        return url_for('hashed_asset', filename=asset.hashed_name(filename))
+
+    @app.route('/assets/<path:filename>', endpoint='hashed_asset')
+    def hashed_asset(filename):
+        logical_name, digest = split_hashed_name(filename)
+        asset = manifest.get(logical_name, reload=app.debug) if logical_name else None
+        if asset is None:
+            abort(404)
+
+        encoding = choose_encoding(asset)
+        response = app.response_class(asset.encodings[encoding], mimetype=asset.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # Each byte representation needs its own strong validator
+        response.set_etag(f'{asset.digest}-{encoding}')
+        # A stale hash (page rendered before a deploy) still gets the current
+        # file, but must not be cached forever under the old URL
+        if digest == asset.digest:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+        return response.make_conditional(request)
+
+    app.add_template_global(asset_url, 'asset_url')
+    app.after_request(compress_response)
+    return manifest
@@ -0,0 +1,357 @@
+"""In-process and shared caches, the Jinja ``{% cache %}`` fragment tag and
+the ORM query result cache.
+
+Fragments are cached under a key built from the tag arguments, e.g.::
+
+    {% cache 'parent_dashboard', student.id, data_version %}
+        ...expensive panels...
+    {% endcache %}
+
+Keys include a data-version stamp that the write routes bump (see
+StudentVersion in models.py), so a write makes the old fragment unreachable
+and it simply ages out of the LRU.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from sqlite_store import SQLiteFileStore
+
+DEFAULT_FRAGMENT_CACHE_SIZE = 512
+DEFAULT_SHARED_CACHE_SIZE = 5000
+DEFAULT_QUERY_CACHE_SIZE = 2048
+DEFAULT_QUERY_CACHE_TTL = 300
+
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(SQLiteFileStore):
+    """String cache in a SQLite file, shared by all worker processes on a host"""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_cache_stored_at ON cache (stored_at)',
+    )
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_size=DEFAULT_SHARED_CACHE_SIZE):
+        self.max_size = max_size
+        self._writes = 0
+        super().__init__(path)
+
+    def get(self, key):
+        try:
+            row = self._connection().execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def set(self, key, value):
+        try:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)',
+                         (key, str(value), time.time()))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self.prune()
+        except sqlite3.Error:
+            # The shared cache is an optimisation; never fail the request over it
+            pass
+
+    def prune(self):
+        """Drop the oldest entries beyond max_size"""
+        self._connection().execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_size,))
+
+    def delete(self, key):
+        try:
+            self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class TieredCache:
+    """Per-process LRU in front of an optional shared backend"""
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+def fragment_key(parts):
+    return 'fragment:' + ':'.join(str(part) for part in parts)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache key, ... %}...{% endcache %}`` to templates"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_namespace=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render_cached', [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        namespace = self.environment.fragment_cache_namespace
+        if namespace is not None:
+            parts = [namespace()] + list(parts)
+        key = fragment_key(parts)
+        value = cache.get(key)
+        if value is None:
+            value = caller()
+            cache.set(key, str(value))
+        return Markup(value)
+
+
+def init_fragment_cache(app):
+    """Attach the fragment cache to app's Jinja environment.
+
+    FRAGMENT_CACHE_SIZE bounds the per-process LRU. If FRAGMENT_CACHE_PATH
+    names a SQLite file, fragments are also shared through it so that all
+    workers benefit from one worker's render.
+    """
+    local = LRUCache(app.config.get('FRAGMENT_CACHE_SIZE', DEFAULT_FRAGMENT_CACHE_SIZE))
+    shared = None
+    shared_path = app.config.get('FRAGMENT_CACHE_PATH')
+    if shared_path:
+        shared = SQLiteCache(shared_path, app.config.get('FRAGMENT_CACHE_SHARED_SIZE', DEFAULT_SHARED_CACHE_SIZE))
+    cache = TieredCache(local, shared)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache
+    app.extensions['fragment_cache'] = cache
+    return cache
+
+
+class TagGenerations:
+    """Per-process invalidation counters, one per tag"""
+
+    def __init__(self):
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, tag):
+        return self._generations.get(tag, 0)
+
+    def bump(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+class FileTagGenerations:
+    """Invalidation counters shared between processes through file mtimes.
+
+    Each tag is an empty file in directory; bumping a tag advances its
+    mtime, which every worker sees with a single stat() call.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, tag):
+        return os.path.join(self.directory, tag)
+
+    def get(self, tag):
+        try:
+            return os.stat(self._path(tag)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, tag):
+        path = self._path(tag)
+        previous = self.get(tag)
+        with open(path, 'a'):
+            pass
+        now = max(time.time_ns(), previous + 1)
+        os.utime(path, ns=(now, now))
+
+
+class QueryCache:
+    """Size-bounded LRU with per-entry TTL and tag-based invalidation.
+
+    An entry remembers the generation of each of its tags at the moment its
+    value started being computed. Invalidating a tag bumps its generation,
+    so entries computed before (or while) the data changed never match
+    again, even if they are stored after the invalidation.
+    """
+
+    def __init__(self, max_size=DEFAULT_QUERY_CACHE_SIZE, default_ttl=DEFAULT_QUERY_CACHE_TTL,
+                 generations=None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.generations = generations or TagGenerations()
+        self._entries = OrderedDict()
+        self._tag_index = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def snapshot(self, tags):
+        """Capture tag generations before computing a value for set()"""
+        return tuple((tag, self.generations.get(tag)) for tag in tags)
+
+    def _is_current(self, stamp):
+        return all(self.generations.get(tag) == generation for tag, generation in stamp)
+
+    def get(self, key):
+        """Return (True, value) on a hit, (False, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, stamp = entry
+                if expires_at > time.monotonic() and self._is_current(stamp):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, stamp, ttl=None):
+        if not self._is_current(stamp):
+            return
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at, stamp)
+            for tag, _ in stamp:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag, _ in entry[2]:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def invalidate_tags(self, tags):
+        for tag in tags:
+            self.generations.bump(tag)
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+def init_query_cache(app):
+    """Create the query result cache from app config.
+
+    QUERY_CACHE_SIZE and QUERY_CACHE_TTL bound the per-process cache.
+    Invalidations are shared through QUERY_CACHE_SYNC_DIR (default
+    ``instance/query_cache``), so a commit in one worker process is seen by
+    every other worker on the host; it must be on the local disk.
+    """
+    sync_dir = app.config.get('QUERY_CACHE_SYNC_DIR') or os.path.join(app.instance_path, 'query_cache')
+    generations = FileTagGenerations(sync_dir)
+    cache = QueryCache(app.config.get('QUERY_CACHE_SIZE', DEFAULT_QUERY_CACHE_SIZE),
+                       app.config.get('QUERY_CACHE_TTL', DEFAULT_QUERY_CACHE_TTL),
+                       generations)
+    app.extensions['query_cache'] = cache
+    return cache
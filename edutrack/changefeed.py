@@ -0,0 +1,92 @@
+"""Change feed reads, compaction and the ``flask changes`` commands.
+
+Clients keep the cursor of the last change they saw and fetch only newer
+changes. Compaction keeps just the newest entry per row, which is safe for
+every cursor because entries carry the full row state. Entries older than
+the retention period are dropped altogether and move the feed horizon
+forward; clients with an older cursor must resync from the regular
+endpoints.
+"""
+import json
+from datetime import datetime, timedelta
+
+import click
+from flask import g, session
+from flask.cli import AppGroup
+
+from models import db, Student, ChangeLog, ChangeFeedMeta
+from schools import school_exists
+from tenancy import DEFAULT_SCHOOL
+
+CHANGE_FEED_PAGE_SIZE = 200
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+CHANGE_FEED_HORIZON_KEY = 'horizon'
+
+def change_feed_horizon():
+    """Cursors below this value may have missed pruned entries"""
+    row = db.session.get(ChangeFeedMeta, CHANGE_FEED_HORIZON_KEY)
+    return row.value if row else 0
+
+def visible_student_ids_query():
+    """Subquery of student ids the logged-in user may see, or None for admins"""
+    if session['role'] == 'parent':
+        return db.select(Student.id).where(Student.parent_id == session['user_id'])
+    if session['role'] == 'teacher':
+        return db.select(Student.id).where(Student.teacher_id == session['user_id'])
+    return None
+
+def change_to_dict(change):
+    return {
+        'cursor': str(change.id),
+        'table': change.table_name,
+        'op': change.operation,
+        'id': change.row_id,
+        'student_id': change.student_id,
+        'data': json.loads(change.payload) if change.payload else None,
+        'at': change.created_at.isoformat()
+    }
+
+def compact_change_feed(older_than_days=7, retention_days=90):
+    """Drop superseded and expired ChangeLog entries; returns (superseded, expired)"""
+    now = datetime.utcnow()
+    table = ChangeLog.__table__
+    newer = table.alias('newer')
+    superseded = db.session.execute(
+        table.delete().where(
+            table.c.created_at < now - timedelta(days=older_than_days),
+            db.exists().where(newer.c.table_name == table.c.table_name,
+                              newer.c.row_id == table.c.row_id,
+                              newer.c.id > table.c.id)
+        )
+    ).rowcount
+
+    # Everything up to the newest expired entry goes, so the horizon is exact
+    last_expired = db.session.execute(
+        db.select(db.func.max(table.c.id)).where(table.c.created_at < now - timedelta(days=retention_days))
+    ).scalar()
+    expired = 0
+    if last_expired is not None:
+        expired = db.session.execute(table.delete().where(table.c.id <= last_expired)).rowcount
+        horizon = db.session.get(ChangeFeedMeta, CHANGE_FEED_HORIZON_KEY)
+        if horizon is None:
+            db.session.add(ChangeFeedMeta(key=CHANGE_FEED_HORIZON_KEY, value=last_expired))
+        else:
+            horizon.value = max(horizon.value, last_expired)
+    db.session.commit()
+    return superseded, expired
+
+changes_cli = AppGroup('changes', help='Maintain the change feed.')
+
+@changes_cli.command('compact')
+@click.option('--school', default=DEFAULT_SCHOOL, show_default=True, help='School code.')
+@click.option('--older-than-days', default=7, show_default=True,
+              help='Only entries older than this are merged into their newest version.')
+@click.option('--retention-days', default=90, show_default=True,
+              help='Entries older than this are dropped; older cursors must resync.')
+def compact_changes_command(school, older_than_days, retention_days):
+    """Compact the change feed."""
+    if not school_exists(school):
+        raise click.BadParameter(f'unknown school {school}', param_hint='--school')
+    g.school = school
+    superseded, expired = compact_change_feed(older_than_days, retention_days)
+    click.echo(f'Removed {superseded} superseded and {expired} expired entries')
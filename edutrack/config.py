@@ -0,0 +1,34 @@
+"""Application configuration.
+
+Defaults live in Config. Every setting can be overridden from the
+environment with an ``EDUTRACK_`` prefix, e.g. ``EDUTRACK_SECRET_KEY`` or
+``EDUTRACK_SQLALCHEMY_DATABASE_URI``; values are parsed as JSON when
+possible, so ``EDUTRACK_QUERY_CACHE_SIZE=4096`` is an integer.
+"""
+ENV_PREFIX = 'EDUTRACK'
+# Only used when DEBUG or TESTING is on; otherwise EDUTRACK_SECRET_KEY is required
+DEV_SECRET_KEY = 'school_monitoring_secret_key_2024'
+
+
+class Config:
+    SECRET_KEY = None
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///school_monitoring.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    ACADEMIC_YEAR_START_MONTH = 6
+
+
+def load_config(app, overrides=None):
+    """Apply Config, then the environment, then overrides (e.g. in scripts).
+
+    Refuses to continue without a secret key outside debug and testing: the
+    session cookie carries the user's role, so a known key lets anyone sign
+    themselves an admin session.
+    """
+    app.config.from_object(Config)
+    app.config.from_prefixed_env(ENV_PREFIX)
+    if overrides:
+        app.config.update(overrides)
+    if not app.config['SECRET_KEY']:
+        if not (app.config['DEBUG'] or app.config['TESTING']):
+            raise RuntimeError(f'{ENV_PREFIX}_SECRET_KEY must be set (or run with --debug for development)')
+        app.config['SECRET_KEY'] = DEV_SECRET_KEY
@@ -0,0 +1,25 @@
+"""Display of stored UTC timestamps in the school's local time."""
+from datetime import timezone
+
+import pytz
+
+# Helper function to convert UTC time to local time
+def utc_to_local(utc_dt):
+    """Convert UTC datetime to local timezone"""
+    try:
+        # Use IST (Indian Standard Time) as default
+        local_tz = pytz.timezone('Asia/Kolkata')
+        if utc_dt.tzinfo is None:
+            utc_dt = utc_dt.replace(tzinfo=timezone.utc)
+        return utc_dt.astimezone(local_tz)
+    except Exception:
+        # Fallback to UTC if timezone conversion fails
+        return utc_dt
+
+# Template filter (registered as 'localtime') for timezone conversion
+def localtime_filter(timestamp):
+    """Convert UTC timestamp to local time for templates"""
+    if timestamp:
+        local_time = utc_to_local(timestamp)
+        return local_time.strftime('%H:%M')
+    return ''
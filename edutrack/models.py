@@ -0,0 +1,279 @@
+"""Database models and the write hooks that keep derived data in step.
+
+Every flush that touches a student's attendance, grades, fees, leave
+requests or messages bumps that student's StudentVersion and appends the
+changes to ChangeLog, in the same transaction as the write itself.
+"""
+import json
+from datetime import datetime, date
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from tenancy import TenantSession
+
+db = SQLAlchemy(session_options={'class_': TenantSession})
+
+# Database Models
+class School(db.Model):
+    # Catalog of schools; always stored in the main database
+    __catalog__ = True
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(40), unique=True, nullable=False)
+    name = db.Column(db.String(120), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(120), nullable=False)
+    plain_password = db.Column(db.String(120), nullable=True)  # Store plain password for admin
+    role = db.Column(db.String(20), nullable=False)  # 'parent', 'teacher', or 'admin'
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Case-insensitive username search in the admin list (see prefix_filter);
+    # AUTOINCREMENT keeps a deleted user's id from being handed out again in
+    # new databases
+    __table_args__ = (
+        db.Index('ix_user_username_nocase', username.collate('NOCASE')),
+        {'sqlite_autoincrement': True},
+    )
+    
+    # Relationships
+    students_as_parent = db.relationship('Student', foreign_keys='Student.parent_id', backref='parent')
+    students_as_teacher = db.relationship('Student', foreign_keys='Student.teacher_id', backref='teacher')
+    leave_requests_as_parent = db.relationship('LeaveRequest', foreign_keys='LeaveRequest.parent_id', backref='parent_user')
+    leave_requests_as_teacher = db.relationship('LeaveRequest', foreign_keys='LeaveRequest.teacher_id', backref='teacher_user')
+
+class Student(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.String(20), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    grade = db.Column(db.String(10), nullable=False)
+    section = db.Column(db.String(10), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Indexes backing the admin list sort (see keyset_paginate) and the
+    # case-insensitive search (see prefix_filter); AUTOINCREMENT keeps a
+    # deleted student's id from being handed out again in new databases
+    __table_args__ = (
+        db.Index('ix_student_name', 'name'),
+        db.Index('ix_student_grade_section', 'grade', 'section'),
+        db.Index('ix_student_name_nocase', name.collate('NOCASE')),
+        db.Index('ix_student_student_id_nocase', student_id.collate('NOCASE')),
+        db.Index('ix_student_grade_section_nocase', grade.collate('NOCASE'), section.collate('NOCASE')),
+        {'sqlite_autoincrement': True},
+    )
+
+class Attendance(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    hour_1 = db.Column(db.Boolean, default=False)
+    hour_2 = db.Column(db.Boolean, default=False)
+    hour_3 = db.Column(db.Boolean, default=False)
+    hour_4 = db.Column(db.Boolean, default=False)
+    hour_5 = db.Column(db.Boolean, default=False)
+    hour_6 = db.Column(db.Boolean, default=False)
+    hour_7 = db.Column(db.Boolean, default=False)
+    hour_8 = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set on rows written for an approved leave until a teacher marks them
+    leave_request_id = db.Column(db.Integer, db.ForeignKey('leave_request.id'), nullable=True)
+
+    @property
+    def present_hours(self):
+        return sum(bool(getattr(self, f'hour_{hour}')) for hour in range(1, 9))
+
+class Grade(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    subject = db.Column(db.String(50), nullable=False)
+    grade = db.Column(db.String(10), nullable=False)
+    marks = db.Column(db.Integer)
+    semester = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Fee(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    fee_type = db.Column(db.String(50), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    paid = db.Column(db.Boolean, default=False)
+    paid_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LeaveRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    leave_type = db.Column(db.String(50), nullable=False)  # 'sick', 'personal', 'other'
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    reason = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'approved', 'rejected'
+    teacher_comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Date-range lookups of approved leave: an overlap query
+    # (end_date >= start AND start_date <= end) seeks to the first leave
+    # still running at start and only walks leaves that end later, which
+    # are few because almost all leave lies in the past
+    __table_args__ = (
+        db.Index('ix_leave_request_interval', 'status', 'end_date', 'start_date'),
+        db.Index('ix_leave_request_teacher_interval', 'teacher_id', 'status', 'end_date', 'start_date'),
+    )
+
+class Message(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    is_read = db.Column(db.Boolean, default=False)
+
+class StudentVersion(db.Model):
+    # Change counter per student, bumped whenever any of the student's
+    # attendance, grades, fees, leave requests or messages are written.
+    # It outlives the student and never goes back: a later student may get
+    # the same id, and (id, version) pairs key cached fragments and ETags
+    student_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChangeLog(db.Model):
+    # Append-only record of writes to student data; id is the sync cursor,
+    # so AUTOINCREMENT keeps ids from being reused after compaction
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(40), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # 'insert', 'update' or 'delete'
+    student_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.Text)  # JSON row state, NULL for deletes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_change_log_student', 'student_id', 'id'),
+        db.Index('ix_change_log_row', 'table_name', 'row_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+class ChangeFeedMeta(db.Model):
+    # Change feed bookkeeping, e.g. the oldest cursor still served
+    key = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
+
+# Models whose rows belong to a student and feed StudentVersion
+VERSIONED_MODELS = (Attendance, Grade, Fee, LeaveRequest, Message)
+# Models whose writes are recorded in ChangeLog
+CHANGE_FEED_MODELS = (Attendance, Grade, Fee, LeaveRequest, Message)
+
+def bump_student_versions(connection, student_ids):
+    """Increment the change counter of each student, creating it if needed"""
+    table = StudentVersion.__table__
+    now = datetime.utcnow()
+    for student_id in student_ids:
+        result = connection.execute(
+            table.update()
+            .where(table.c.student_id == student_id)
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(student_id=student_id, version=1, updated_at=now))
+
+@event.listens_for(Session, 'after_flush')
+def track_student_changes(session, flush_context):
+    """Bump StudentVersion in the same transaction as the flushed changes"""
+    student_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, VERSIONED_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if obj.student_id is not None:
+            student_ids.add(int(obj.student_id))
+    if student_ids:
+        bump_student_versions(session.connection(), sorted(student_ids))
+
+def change_payload(obj):
+    """JSON snapshot of a row for the change feed"""
+    data = {}
+    for column in inspect(obj).mapper.column_attrs:
+        value = getattr(obj, column.key)
+        data[column.key] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return json.dumps(data, separators=(',', ':'))
+
+def write_change_entries(connection, entries):
+    if entries:
+        connection.execute(ChangeLog.__table__.insert(), entries)
+
+@event.listens_for(Session, 'after_flush')
+def record_change_feed(session, flush_context):
+    """Append ChangeLog entries in the same transaction as the flushed changes"""
+    entries = []
+    now = datetime.utcnow()
+    for operation, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, CHANGE_FEED_MODELS):
+                continue
+            if operation == 'update' and not session.is_modified(obj):
+                continue
+            entries.append({
+                'table_name': obj.__tablename__,
+                'row_id': obj.id,
+                'operation': operation,
+                'student_id': int(obj.student_id) if obj.student_id is not None else None,
+                'payload': None if operation == 'delete' else change_payload(obj),
+                'created_at': now
+            })
+    write_change_entries(session.connection(), entries)
+
+def insert_with_changes(model, rows):
+    """Insert rows (dicts) of a change-feed model in one statement.
+
+    Bulk inserts bypass the flush hooks, so the change entries and student
+    versions are written here. Returns the new instances.
+    """
+    objects = db.session.scalars(
+        db.insert(model).returning(model), rows
+    ).all()
+    now = datetime.utcnow()
+    connection = db.session.connection()
+    write_change_entries(connection, [
+        {'table_name': model.__tablename__, 'row_id': obj.id, 'operation': 'insert',
+         'student_id': obj.student_id, 'payload': change_payload(obj), 'created_at': now}
+        for obj in objects
+    ])
+    bump_student_versions(connection, sorted({obj.student_id for obj in objects}))
+    return objects
+
+def delete_student_data(student_id):
+    """Delete all rows belonging to a student before deleting the student.
+
+    The student's version is bumped rather than deleted, so a student that
+    later reuses the id never matches the old student's cached data.
+    """
+    for model in VERSIONED_MODELS:
+        delete_with_changes(model.query.filter_by(student_id=student_id))
+    bump_student_versions(db.session.connection(), [student_id])
+
+def delete_with_changes(query):
+    """Bulk delete a change-feed model query, recording a delete entry per row
+    and bumping the affected students' versions"""
+    model = query.column_descriptions[0]['entity']
+    rows = query.with_entities(model.id, model.student_id).all()
+    now = datetime.utcnow()
+    write_change_entries(db.session.connection(), [
+        {'table_name': model.__tablename__, 'row_id': row_id, 'operation': 'delete',
+         'student_id': student_id, 'payload': None, 'created_at': now}
+        for row_id, student_id in rows
+    ])
+    bump_student_versions(db.session.connection(), sorted({student_id for _, student_id in rows}))
+    return query.delete(synchronize_session=False)
@@ -0,0 +1,311 @@
+"""Read-side helpers: the query result cache, cached lookups, per-student
+data versions and lazily loaded dashboard panels.
+"""
+import hashlib
+from datetime import date
+from functools import wraps, cached_property
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session, make_transient_to_detached
+
+from models import db, User, Student, Attendance, Grade, Fee, LeaveRequest, Message, StudentVersion
+from tenancy import current_school_slug
+
+# Query result cache
+# Hot read queries opt in with @cached_query(Model, ...). Writes to those
+# models (ORM flushes and bulk update/delete) invalidate the matching tags
+# when they are flushed and again when the transaction commits or rolls back.
+CACHED_MODELS = (User, Student, Attendance, Grade, Fee, LeaveRequest, Message)
+
+class CachedRow:
+    """Column snapshot of an ORM instance, safe to share between sessions"""
+    __slots__ = ('model', 'data')
+
+    def __init__(self, instance):
+        self.model = type(instance)
+        self.data = {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+    def restore(self):
+        instance = self.model(**self.data)
+        make_transient_to_detached(instance)
+        return db.session.merge(instance, load=False)
+
+def snapshot_result(value):
+    if isinstance(value, list):
+        return [snapshot_result(v) for v in value]
+    if isinstance(value, db.Model):
+        return CachedRow(value)
+    return value
+
+def restore_result(value):
+    if isinstance(value, list):
+        return [restore_result(v) for v in value]
+    if isinstance(value, CachedRow):
+        return value.restore()
+    return value
+
+def get_query_cache():
+    return current_app.extensions['query_cache']
+
+def cache_tag(table_name):
+    # Each school has its own database, so tags and keys are per school
+    return f'{current_school_slug()}:{table_name}'
+
+def cached_query(*models, ttl=None):
+    """Cache a query function's result, keyed by its arguments and tagged by models"""
+    tables = tuple(model.__tablename__ for model in models)
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = (current_school_slug(), func.__name__) + args
+            query_cache = get_query_cache()
+            found, value = query_cache.get(key)
+            if found:
+                return restore_result(value)
+            stamp = query_cache.snapshot([cache_tag(table) for table in tables])
+            result = func(*args)
+            query_cache.set(key, snapshot_result(result), stamp, ttl)
+            return result
+        return wrapper
+    return decorator
+
+def record_cache_write(session, tag):
+    session.info.setdefault('query_cache_tags', set()).add(tag)
+
+def track_cached_model_write(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        record_cache_write(session, cache_tag(mapper.local_table.name))
+
+for model in CACHED_MODELS:
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, event_name, track_cached_model_write)
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_cache_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in CACHED_MODELS:
+            tag = cache_tag(mapper.local_table.name)
+            record_cache_write(orm_execute_state.session, tag)
+            get_query_cache().invalidate_tags([tag])
+
+@event.listens_for(Session, 'after_flush_postexec')
+def invalidate_flushed_queries(session, flush_context):
+    # Keep the writing session from reading its own stale cache entries
+    tags = session.info.get('query_cache_tags')
+    if tags:
+        get_query_cache().invalidate_tags(tags)
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def invalidate_committed_queries(session):
+    # Entries computed between the flush and the commit saw the old data
+    tags = session.info.pop('query_cache_tags', None)
+    if tags:
+        get_query_cache().invalidate_tags(tags)
+
+@cached_query(User)
+def get_user(user_id):
+    return db.session.get(User, user_id)
+
+@cached_query(User)
+def get_teachers():
+    return User.query.filter_by(role='teacher').order_by(User.username).all()
+
+@cached_query(Fee)
+def get_pending_fees(student_id):
+    return Fee.query.filter_by(student_id=student_id, paid=False).all()
+
+@cached_query(LeaveRequest)
+def get_student_leave_requests(student_id):
+    return LeaveRequest.query.filter_by(student_id=student_id).order_by(LeaveRequest.created_at.desc()).all()
+
+@cached_query(LeaveRequest)
+def get_teacher_leave_requests(teacher_id):
+    return LeaveRequest.query.filter_by(teacher_id=teacher_id).order_by(LeaveRequest.created_at.desc()).all()
+
+@cached_query(LeaveRequest)
+def get_pending_teacher_leave_requests(teacher_id):
+    return LeaveRequest.query.filter_by(
+        teacher_id=teacher_id,
+        status='pending'
+    ).order_by(LeaveRequest.created_at.desc()).all()
+
+@cached_query(LeaveRequest)
+def get_approved_leaves(start, end, teacher_id=None):
+    """Approved leave requests overlapping the days start..end (inclusive)"""
+    query = LeaveRequest.query.filter(
+        LeaveRequest.status == 'approved',
+        LeaveRequest.end_date >= start,
+        LeaveRequest.start_date <= end
+    )
+    if teacher_id is not None:
+        query = query.filter(LeaveRequest.teacher_id == teacher_id)
+    return query.order_by(LeaveRequest.start_date).all()
+
+def students_on_leave(day, teacher_id=None):
+    """Map of student id to the approved leave covering day"""
+    return {leave.student_id: leave for leave in get_approved_leaves(day, day, teacher_id)}
+
+def student_data_version(student_id):
+    """Current change counter of a student (0 if nothing was ever written)"""
+    row = db.session.get(StudentVersion, student_id)
+    return row.version if row else 0
+
+def teacher_data_version(teacher_id):
+    """Stamp that changes whenever a teacher's students or their data change.
+
+    A digest of every (student id, version) pair: versions only ever go up,
+    even across a student's deletion, so a stamp never comes back for
+    different data (a sum of counters could).
+    """
+    rows = db.session.query(Student.id, db.func.coalesce(StudentVersion.version, 0)).outerjoin(
+        StudentVersion, StudentVersion.student_id == Student.id
+    ).filter(Student.teacher_id == teacher_id).order_by(Student.id).all()
+    pairs = ','.join(f'{student_id}:{version}' for student_id, version in rows)
+    return hashlib.sha1(pairs.encode('ascii')).hexdigest()[:16]
+
+# Dashboard panel data, loaded on first access so that a fragment cache hit
+# in the template skips the queries entirely
+class ParentPanels:
+    def __init__(self, student):
+        self.student = student
+
+    @cached_property
+    def attendance(self):
+        return Attendance.query.filter_by(student_id=self.student.id, date=date.today()).first()
+
+    @cached_property
+    def grades(self):
+        return Grade.query.filter_by(student_id=self.student.id).order_by(Grade.created_at.desc()).limit(5).all()
+
+    @cached_property
+    def fees(self):
+        return get_pending_fees(self.student.id)
+
+    @cached_property
+    def leave_requests(self):
+        return get_student_leave_requests(self.student.id)
+
+class TeacherPanels:
+    def __init__(self, teacher_id):
+        self.teacher_id = teacher_id
+
+    @cached_property
+    def students(self):
+        return Student.query.filter_by(teacher_id=self.teacher_id).all()
+
+    @cached_property
+    def pending_leaves(self):
+        return get_pending_teacher_leave_requests(self.teacher_id)
+
+    @cached_property
+    def recent_messages(self):
+        # Last 5 messages sent to the teacher about their students
+        student_ids = [s.id for s in self.students]
+        recent_messages = []
+        if student_ids:
+            try:
+                messages = Message.query.filter(
+                    Message.student_id.in_(student_ids),
+                    Message.receiver_id == self.teacher_id
+                ).order_by(Message.timestamp.desc()).limit(5).all()
+
+                for msg in messages:
+                    student = Student.query.get(msg.student_id)
+                    parent = User.query.get(msg.sender_id)
+                    recent_messages.append({
+                        'id': msg.id,
+                        'content': msg.content,
+                        'timestamp': msg.timestamp,
+                        'parent_name': parent.username if parent else 'Unknown',
+                        'student_name': student.name if student else 'Unknown'
+                    })
+            except Exception as e:
+                # If there's any error with messages, just continue with empty list
+                recent_messages = []
+        return recent_messages
+
+# Family overview: all of a parent's children side by side
+FAMILY_RECENT_GRADES = 3
+
+def family_students(parent_id):
+    """A parent's students paired with their change counters, in one query"""
+    return db.session.query(Student, db.func.coalesce(StudentVersion.version, 0)).outerjoin(
+        StudentVersion, StudentVersion.student_id == Student.id
+    ).filter(Student.parent_id == parent_id).order_by(Student.id).all()
+
+def family_data_version(students_with_versions):
+    """Stamp that changes whenever any child is added, removed or written"""
+    return '.'.join(f'{student.id}:{version}' for student, version in students_with_versions)
+
+class FamilyOverview:
+    """Per-child panels for the family overview, loaded on first access.
+
+    Every panel is a single query over all the children (student_id IN
+    ...), so the overview costs the same handful of queries however many
+    children a parent has. Panels map student id to that child's data.
+    """
+    def __init__(self, students, day=None):
+        self.students = students
+        self.student_ids = [s.id for s in students]
+        self.day = day or date.today()
+
+    @cached_property
+    def attendance(self):
+        if not self.student_ids:
+            return {}
+        records = Attendance.query.filter(
+            Attendance.student_id.in_(self.student_ids),
+            Attendance.date == self.day
+        ).all()
+        return {record.student_id: record for record in records}
+
+    @cached_property
+    def recent_grades(self):
+        grades = {student_id: [] for student_id in self.student_ids}
+        if not self.student_ids:
+            return grades
+        # Newest grades per student, ranked inside the database
+        ranked = db.select(
+            Grade.id,
+            db.func.row_number().over(
+                partition_by=Grade.student_id,
+                order_by=(Grade.created_at.desc(), Grade.id.desc())
+            ).label('rank')
+        ).where(Grade.student_id.in_(self.student_ids)).subquery()
+        rows = Grade.query.join(ranked, ranked.c.id == Grade.id).filter(
+            ranked.c.rank <= FAMILY_RECENT_GRADES
+        ).order_by(Grade.student_id, ranked.c.rank).all()
+        for grade in rows:
+            grades[grade.student_id].append(grade)
+        return grades
+
+    @cached_property
+    def outstanding_fees(self):
+        """student id -> (number of unpaid fees, total amount)"""
+        totals = {student_id: (0, 0.0) for student_id in self.student_ids}
+        if not self.student_ids:
+            return totals
+        rows = db.session.query(Fee.student_id, db.func.count(Fee.id), db.func.sum(Fee.amount)).filter(
+            Fee.student_id.in_(self.student_ids),
+            Fee.paid == False
+        ).group_by(Fee.student_id).all()
+        for student_id, count, total in rows:
+            totals[student_id] = (count, total or 0.0)
+        return totals
+
+    @cached_property
+    def pending_leaves(self):
+        leaves = {student_id: [] for student_id in self.student_ids}
+        if not self.student_ids:
+            return leaves
+        rows = LeaveRequest.query.filter(
+            LeaveRequest.student_id.in_(self.student_ids),
+            LeaveRequest.status == 'pending'
+        ).order_by(LeaveRequest.start_date).all()
+        for leave in rows:
+            leaves[leave.student_id].append(leave)
+        return leaves
@@ -0,0 +1,247 @@
+"""Token-bucket rate limiting and load shedding.
+
+Views opt in with the ``rate_limit`` decorator, e.g.::
+
+    @rate_limit('login', ip='20/minute', user='5/minute', user_key=login_attempt_key)
+
+Each (route, client IP) and (route, user) pair gets its own bucket holding
+up to N tokens that refill evenly over the period; a request spends one
+token and is answered with 429 when its bucket is empty. Buckets live in
+the worker's memory, or in a SQLite file shared by all workers on the host
+when RATELIMIT_STORAGE_PATH is set. Behind a reverse proxy, set
+TRUSTED_PROXIES so the client IP is taken from X-Forwarded-For; otherwise
+every request appears to come from the proxy and shares one IP bucket.
+
+Independently, a global concurrency limit caps the requests a worker
+handles at once. Requests beyond it wait briefly for a slot and are then
+turned away with 503, so a burst cannot queue up behind slow requests and
+push latency up for everyone.
+"""
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import abort, current_app, g, request, session
+
+from sqlite_store import SQLiteFileStore
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 64
+DEFAULT_CONCURRENCY_WAIT = 0.1
+# Endpoints never subject to load shedding (cheap, and needed to render pages)
+SHEDDING_EXEMPT_ENDPOINTS = {'static', 'hashed_asset'}
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'5/minute' -> (capacity 5, refill rate in tokens per second)"""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    if count <= 0 or period not in PERIODS:
+        raise ValueError(f'invalid rate {rate!r}')
+    return count, count / PERIODS[period]
+
+
+class MemoryBucketStore:
+    """Token buckets in a plain dict, without locks.
+
+    Each bucket is an immutable tuple that is replaced as a whole, so
+    readers never see a half-updated bucket. Two threads spending from the
+    same bucket at the same instant may both succeed, which errs on the side
+    of letting a request through and is fine for throttling.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self._buckets = {}
+        self._calls = 0
+
+    def consume(self, key, capacity, rate, cost=1):
+        """Spend cost tokens; return 0 if allowed, else seconds until allowed"""
+        now = time.monotonic()
+        tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            self.prune(now)
+        return retry_after
+
+    def prune(self, now=None):
+        """Forget buckets that have refilled completely"""
+        now = time.monotonic() if now is None else now
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore(SQLiteFileStore):
+    """Token buckets in a SQLite file, shared by all worker processes on a host"""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS bucket '
+        '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)',
+    )
+    # A login should not queue behind other workers for long
+    TIMEOUT = 1
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self._writes = 0
+        super().__init__(path)
+
+    def consume(self, key, capacity, rate, cost=1):
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT tokens, updated_at FROM bucket WHERE key = ?', (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                retry_after = 0.0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    retry_after = (cost - tokens) / rate
+                conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)',
+                             (key, tokens, now, now + (capacity - tokens) / rate))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                conn.execute('DELETE FROM bucket WHERE full_at <= ?', (now,))
+        except sqlite3.Error:
+            # Throttling is a safeguard; never fail the request over it
+            return 0.0
+        return retry_after
+
+
+class RateLimiter:
+    """Checks requests against token buckets in a store"""
+
+    def __init__(self, store, enabled=True, namespace=None):
+        self.store = store
+        self.enabled = enabled
+        # Optional callable returning a key prefix, e.g. the current school
+        self.namespace = namespace
+        self.limited = 0
+
+    def check(self, route, rules):
+        """Spend a token from each (scope, identity, rate) rule's bucket.
+
+        Returns 0 when the request may proceed, otherwise the number of
+        seconds until it would be allowed.
+        """
+        if not self.enabled:
+            return 0.0
+        prefix = f'{self.namespace()}:{route}' if self.namespace else route
+        retry_after = 0.0
+        for scope, identity, rate in rules:
+            if identity is None:
+                continue
+            capacity, refill = parse_rate(rate)
+            retry_after = max(retry_after, self.store.consume(f'{prefix}:{scope}:{identity}', capacity, refill))
+        if retry_after:
+            self.limited += 1
+        return retry_after
+
+
+def session_user():
+    return session.get('user_id')
+
+
+def rate_limit(route, ip=None, user=None, user_key=session_user, methods=('POST',)):
+    """Decorator limiting a view per client IP and per user.
+
+    ip and user are rates such as '10/minute'. user_key returns the
+    identity to limit per user; it defaults to the logged-in user id, but
+    e.g. the login view limits by the submitted username and client IP. Only
+    requests with one of methods are counted.
+    """
+    for rate in (ip, user):
+        if rate is not None:
+            parse_rate(rate)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method in methods:
+                rules = []
+                if ip is not None:
+                    rules.append(('ip', request.remote_addr, ip))
+                if user is not None:
+                    rules.append(('user', user_key(), user))
+                retry_after = current_app.extensions['rate_limiter'].check(route, rules)
+                if retry_after:
+                    abort(429, retry_after=max(1, round(retry_after)))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ConcurrencyLimiter:
+    """Bounds the number of requests a worker processes at the same time"""
+
+    def __init__(self, max_concurrent, wait=DEFAULT_CONCURRENCY_WAIT):
+        self.max_concurrent = max_concurrent
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self.shed = 0
+
+    def acquire(self):
+        if self._slots.acquire(timeout=self.wait):
+            return True
+        self.shed += 1
+        return False
+
+    def release(self):
+        self._slots.release()
+
+
+def init_rate_limits(app):
+    """Create the rate limiter and the load-shedding hooks from app config.
+
+    RATELIMIT_ENABLED (default True) switches per-route limits on or off.
+    RATELIMIT_STORAGE_PATH names a SQLite file to share buckets between
+    worker processes. MAX_CONCURRENT_REQUESTS (default 64, 0 disables)
+    and CONCURRENCY_WAIT (seconds a request may wait for a slot) control
+    load shedding.
+    """
+    storage_path = app.config.get('RATELIMIT_STORAGE_PATH')
+    store = SQLiteBucketStore(storage_path) if storage_path else MemoryBucketStore()
+    limiter = RateLimiter(store, app.config.get('RATELIMIT_ENABLED', True))
+    app.extensions['rate_limiter'] = limiter
+
+    max_concurrent = app.config.get('MAX_CONCURRENT_REQUESTS', DEFAULT_MAX_CONCURRENT_REQUESTS)
+    if max_concurrent:
+        concurrency = ConcurrencyLimiter(max_concurrent, app.config.get('CONCURRENCY_WAIT', DEFAULT_CONCURRENCY_WAIT))
+        app.extensions['concurrency_limiter'] = concurrency
+
+        @app.before_request
+        def acquire_request_slot():
+            if request.endpoint in SHEDDING_EXEMPT_ENDPOINTS:
+                return
+            if not concurrency.acquire():
+                abort(503, retry_after=1)
+            g._request_slot = True
+
+        @app.teardown_request
+        def release_request_slot(exc):
+            if g.pop('_request_slot', False):
+                concurrency.release()
+
+    return limiter
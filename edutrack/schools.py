@@ -0,0 +1,162 @@
+"""School routing for requests, per-school database administration and the
+``flask school`` commands.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import abort, current_app, g, request, session
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+from werkzeug.security import generate_password_hash
+
+from models import db, School, User, Student, Attendance, Fee, LeaveRequest
+from ratelimit import SHEDDING_EXEMPT_ENDPOINTS
+from tenancy import DEFAULT_SCHOOL, is_valid_slug, school_from_host
+
+# School routing
+known_schools = set()
+
+def school_exists(slug):
+    """Whether slug names a school in the catalog (found schools are remembered per worker)"""
+    if slug == DEFAULT_SCHOOL or slug in known_schools:
+        return True
+    if not is_valid_slug(slug):
+        return False
+    if School.query.filter_by(slug=slug).first() is None:
+        return False
+    known_schools.add(slug)
+    return True
+
+def host_school():
+    return school_from_host(request.host, current_app.config.get('SCHOOL_HOST_SUFFIX'))
+
+def select_school():
+    """before_request hook: resolve the school of the request into g.school"""
+    if request.endpoint in SHEDDING_EXEMPT_ENDPOINTS:
+        # Static files are the same for every school; reading the session
+        # would add Vary: Cookie and keep shared caches from storing them
+        return
+    slug = host_school()
+    if slug is None:
+        slug = session.get('school', DEFAULT_SCHOOL)
+        if not school_exists(slug):
+            session.clear()
+            slug = DEFAULT_SCHOOL
+    elif not school_exists(slug):
+        abort(404)
+
+    # A login is only valid in the school it was made in
+    if 'user_id' in session and session.get('school', DEFAULT_SCHOOL) != slug:
+        session.clear()
+    g.school = slug
+
+# School administration
+def school_tables():
+    """Tables that live in each school's database (everything but the catalog)"""
+    return [table for table in db.metadata.sorted_tables if table.name != School.__tablename__]
+
+def migrate_school(slug):
+    """Create any missing tables, columns and indexes in a school's database"""
+    engine = school_engine(slug)
+    if slug == DEFAULT_SCHOOL:
+        db.create_all()
+        tables = db.metadata.sorted_tables
+    else:
+        tables = school_tables()
+        db.metadata.create_all(engine, tables=tables)
+    # create_all skips tables that already exist, even if they lack newer
+    # columns or indexes. New columns must be nullable (SQLite can only add
+    # those to an existing table).
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+def school_engine(slug):
+    return db.engine if slug == DEFAULT_SCHOOL else current_app.extensions['school_engines'].get(slug)
+
+def school_report(slug, engine):
+    """Aggregate counts for one school, using its own session and connection"""
+    with Session(engine) as school_session:
+        def count(column, *criteria):
+            return school_session.scalar(db.select(db.func.count(column)).where(*criteria))
+
+        return {
+            'school': slug,
+            'students': count(Student.id),
+            'teachers': count(User.id, User.role == 'teacher'),
+            'parents': count(User.id, User.role == 'parent'),
+            'attendance_records': count(Attendance.id),
+            'pending_leaves': count(LeaveRequest.id, LeaveRequest.status == 'pending'),
+            'outstanding_fees': school_session.scalar(
+                db.select(db.func.coalesce(db.func.sum(Fee.amount), 0)).where(Fee.paid == False)),
+        }
+
+def cross_school_report(max_workers=8):
+    """Run school_report for every school in parallel"""
+    slugs = [DEFAULT_SCHOOL] + [s.slug for s in School.query.order_by(School.slug).all()]
+    # Engines are resolved here; the worker threads have no app context
+    engines = [school_engine(slug) for slug in slugs]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(school_report, slugs, engines))
+
+
+school_cli = AppGroup('school', help='Manage per-school databases.')
+
+@school_cli.command('create')
+@click.argument('slug')
+@click.argument('name')
+@click.option('--admin-password', prompt=True, hide_input=True, confirmation_prompt=True,
+              help='Password of the school\'s admin user.')
+def create_school_command(slug, name, admin_password):
+    """Register a school, create its database and its admin user."""
+    slug = slug.lower()
+    if not is_valid_slug(slug) or slug == DEFAULT_SCHOOL:
+        raise click.BadParameter('use lowercase letters, digits and dashes', param_hint='SLUG')
+    db.create_all()
+    if School.query.filter_by(slug=slug).first():
+        raise click.ClickException(f'School {slug} already exists.')
+    migrate_school(slug)
+
+    g.school = slug
+    # Two databases cannot be committed atomically: set up the school's own
+    # database first and list the school only once that succeeded (a rerun
+    # after a failure keeps the admin user already created)
+    if User.query.filter_by(username='admin').first() is None:
+        db.session.add(User(
+            username='admin',
+            password_hash=generate_password_hash(admin_password),
+            plain_password=admin_password,
+            role='admin',
+            email=f'admin@{slug}.school'
+        ))
+        db.session.commit()
+    db.session.add(School(slug=slug, name=name))
+    db.session.commit()
+    click.echo(f"Created school {slug} at {current_app.extensions['school_engines'].database_uri(slug)}")
+
+@school_cli.command('migrate')
+@click.argument('slug', required=False)
+def migrate_school_command(slug):
+    """Create missing tables in one school's database, or in all of them."""
+    slugs = [slug] if slug else [DEFAULT_SCHOOL] + [s.slug for s in School.query.all()]
+    for each in slugs:
+        migrate_school(each)
+        click.echo(f'Migrated {each}')
+
+@school_cli.command('report')
+@click.option('--workers', default=8, show_default=True, help='Schools queried in parallel.')
+def school_report_command(workers):
+    """Print aggregate counts for every school."""
+    for row in cross_school_report(workers):
+        click.echo(json.dumps(row))
+
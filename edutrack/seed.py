@@ -0,0 +1,81 @@
+"""Database setup and demo data: the ``flask init-db`` and ``flask seed``
+commands.
+
+Run these once per deployment, before the workers start. Nothing touches
+the database at import or app creation time, so any number of forked
+workers can start at once without racing to create tables or seed rows.
+"""
+import click
+from flask import g
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from models import db, School, User, Student
+from schools import migrate_school, school_exists
+from tenancy import DEFAULT_SCHOOL
+
+# (username, password, role, email)
+DEMO_USERS = (
+    ('admin', 'admin123', 'admin', 'admin@school.com'),
+    ('teacher1', 'teacher123', 'teacher', 'teacher1@school.com'),
+    ('parent1', 'parent123', 'parent', 'parent1@email.com'),
+)
+
+
+def init_database():
+    """Create missing tables in the main database and in every school's database"""
+    migrate_school(DEFAULT_SCHOOL)
+    for school in School.query.filter(School.slug != DEFAULT_SCHOOL).order_by(School.slug).all():
+        migrate_school(school.slug)
+
+
+def seed_demo_data():
+    """Add the demo users and student in one transaction.
+
+    Returns False without writing anything if the database already has
+    users other than admins (``flask school create`` adds an ``admin``
+    user to every new school; an existing admin is kept as it is).
+    """
+    if User.query.filter(User.role != 'admin').first() is not None:
+        return False
+    existing = {username for (username,) in db.session.query(User.username)}
+    rows = [
+        {'username': username, 'password_hash': generate_password_hash(password),
+         'plain_password': password, 'role': role, 'email': email}
+        for username, password, role, email in DEMO_USERS if username not in existing
+    ]
+    # One multi-row INSERT ... RETURNING; the student needs the generated ids
+    users = {user.username: user for user in db.session.scalars(db.insert(User).returning(User), rows)}
+    db.session.add(Student(
+        student_id='STU001',
+        name='John Doe',
+        grade='10',
+        section='A',
+        parent_id=users['parent1'].id,
+        teacher_id=users['teacher1'].id
+    ))
+    db.session.commit()
+    return True
+
+
+@click.command('init-db')
+@click.option('--seed', 'with_seed', is_flag=True, help='Also add the demo users to an empty main database.')
+@with_appcontext
+def init_db_command(with_seed):
+    """Create the database tables (safe to run again)."""
+    init_database()
+    click.echo('Initialized the database')
+    if with_seed:
+        click.echo('Added demo data' if seed_demo_data() else 'Database already has users; not seeded')
+
+
+@click.command('seed')
+@click.option('--school', default=DEFAULT_SCHOOL, show_default=True, help='School code.')
+@with_appcontext
+def seed_command(school):
+    """Add the demo users and student to an empty school database."""
+    if not school_exists(school):
+        raise click.BadParameter(f'unknown school {school}', param_hint='--school')
+    g.school = school
+    migrate_school(school)
+    click.echo('Added demo data' if seed_demo_data() else 'Database already has users; not seeded')
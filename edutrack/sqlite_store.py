@@ -0,0 +1,40 @@
+"""Small key-value stores in a SQLite file shared by the worker processes
+of one host (the shared fragment cache and the rate-limit buckets).
+
+Each thread opens its own connection in autocommit mode with WAL
+journaling, so readers never block the writer.
+"""
+import os
+import sqlite3
+import threading
+
+
+class SQLiteFileStore:
+    """Base class: per-thread connections to a SQLite file with SCHEMA applied"""
+
+    SCHEMA = ()
+    # Seconds to wait for another process's write lock
+    TIMEOUT = 5
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def reset_after_fork(self):
+        # SQLite connections must not be shared with the parent process
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
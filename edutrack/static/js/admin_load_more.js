@@ -0,0 +1,38 @@
+(function () {
+    const button = document.getElementById('loadMoreBtn');
+    const tbody = document.getElementById(button.dataset.rows);
+    let loading = false;
+
+    function loadMore() {
+        const cursor = button.dataset.cursor;
+        if (loading || !cursor) {
+            return;
+        }
+        loading = true;
+        const params = new URLSearchParams(window.location.search);
+        params.set('after', cursor);
+        params.set('rows', button.dataset.kind);
+        fetch(`${button.dataset.url}?${params.toString()}`)
+            .then(response => response.json())
+            .then(data => {
+                tbody.insertAdjacentHTML('beforeend', data.html || '');
+                button.dataset.cursor = data.next_cursor || '';
+                if (!data.next_cursor) {
+                    document.getElementById('loadMore').style.display = 'none';
+                }
+            })
+            .catch(error => console.error('Error:', error))
+            .finally(() => { loading = false; });
+    }
+
+    button.addEventListener('click', loadMore);
+
+    // Infinite scroll: fetch the next page as the button comes into view
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMore();
+            }
+        }).observe(button);
+    }
+})();
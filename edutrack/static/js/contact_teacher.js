@@ -0,0 +1,36 @@
+// Auto-scroll to bottom of chat
+function scrollToBottom() {
+    const chatMessages = document.getElementById('chatMessages');
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+// Scroll to bottom on page load
+window.onload = function() {
+    scrollToBottom();
+};
+
+// Handle form submission
+document.getElementById('chatForm').addEventListener('submit', function(e) {
+    const input = document.querySelector('.chat-input');
+    const sendBtn = document.querySelector('.send-btn');
+
+    if (!input.value.trim()) {
+        e.preventDefault();
+        return;
+    }
+
+    // Disable button and show loading
+    sendBtn.disabled = true;
+    sendBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+});
+
+// Change student function
+function changeStudent(studentId) {
+    window.location.href = `/contact_teacher?student_id=${studentId}`;
+}
+
+// Auto-resize input (optional enhancement)
+document.querySelector('.chat-input').addEventListener('input', function() {
+    this.style.height = 'auto';
+    this.style.height = Math.min(this.scrollHeight, 100) + 'px';
+});
@@ -0,0 +1,36 @@
+function toggleAttendance(studentId, hour, button) {
+    const isPresent = button.classList.contains('present');
+    const newStatus = !isPresent;
+
+    fetch('/update_attendance', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        },
+        body: `student_id=${studentId}&date=${document.getElementById('attendanceDate').value}&hour=${hour}&present=${newStatus}`
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            if (newStatus) {
+                button.classList.remove('absent');
+                button.classList.add('present');
+                button.textContent = '✓';
+            } else {
+                button.classList.remove('present');
+                button.classList.add('absent');
+                button.textContent = '✗';
+            }
+        } else {
+            alert('Error updating attendance');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error updating attendance');
+    });
+}
+
+function changeDate(date) {
+    window.location.href = `/attendance?date=${date}`;
+}
@@ -0,0 +1,28 @@
+function approveLeave(leaveId) {
+    document.getElementById('leaveId').value = leaveId;
+    document.getElementById('leaveStatus').value = 'approved';
+    document.getElementById('leaveModal').style.display = 'block';
+}
+
+function rejectLeave(leaveId) {
+    document.getElementById('leaveId').value = leaveId;
+    document.getElementById('leaveStatus').value = 'rejected';
+    document.getElementById('leaveModal').style.display = 'block';
+}
+
+function closeModal() {
+    document.getElementById('leaveModal').style.display = 'none';
+}
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+    const modal = document.getElementById('leaveModal');
+    if (event.target == modal) {
+        modal.style.display = 'none';
+    }
+}
+
+// Close modal when clicking X
+document.querySelector('.close').onclick = function() {
+    closeModal();
+}
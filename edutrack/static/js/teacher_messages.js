@@ -0,0 +1,76 @@
+// Auto-scroll to bottom of chat
+function scrollToBottom() {
+    const chatMessages = document.getElementById('chatMessages');
+    if (chatMessages) {
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+}
+
+// Scroll to bottom on page load
+window.addEventListener('load', function() {
+    scrollToBottom();
+    document.getElementById('searchInput').value = '';
+});
+
+// Handle form submission
+document.getElementById('chatForm')?.addEventListener('submit', function(e) {
+    const input = document.querySelector('.chat-input');
+    const sendBtn = document.querySelector('.send-btn');
+
+    if (!input.value.trim()) {
+        e.preventDefault();
+        return;
+    }
+
+    // Disable button and show loading
+    sendBtn.disabled = true;
+    sendBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+});
+
+// Select chat function
+function selectChat(parentId, parentName, studentName) {
+    // Update URL to show selected chat
+    window.location.href = `/messages?parent_id=${parentId}`;
+}
+
+// Auto-resize input (optional enhancement)
+document.querySelector('.chat-input')?.addEventListener('input', function() {
+    this.style.height = 'auto';
+    this.style.height = Math.min(this.scrollHeight, 100) + 'px';
+});
+
+// Filter chats based on search input
+function filterChats() {
+    const searchInput = document.getElementById('searchInput');
+    const chatList = document.getElementById('chatList');
+    const chatItems = chatList.getElementsByClassName('chat-item');
+    const searchTerm = searchInput.value.toLowerCase();
+    let visibleCount = 0;
+
+    for (let i = 0; i < chatItems.length; i++) {
+        const chatItem = chatItems[i];
+        const chatName = chatItem.querySelector('.chat-name').textContent.toLowerCase();
+        const studentName = chatItem.querySelector('.chat-preview').textContent.toLowerCase();
+
+        if (chatName.includes(searchTerm) || studentName.includes(searchTerm)) {
+            chatItem.style.display = 'flex';
+            visibleCount++;
+        } else {
+            chatItem.style.display = 'none';
+        }
+    }
+
+    // Show no results message if no chats match
+    const noResults = document.getElementById('noResults');
+    if (visibleCount === 0 && searchTerm !== '') {
+        if (!noResults) {
+            const noResultsDiv = document.createElement('div');
+            noResultsDiv.id = 'noResults';
+            noResultsDiv.className = 'no-chats';
+            noResultsDiv.innerHTML = '<i class="fas fa-search"></i><p>No parents found</p>';
+            chatList.appendChild(noResultsDiv);
+        }
+    } else if (noResults) {
+        noResults.remove();
+    }
+}
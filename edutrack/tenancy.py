@@ -0,0 +1,118 @@
+"""Per-school database routing.
+
+The main database holds the ``school`` catalog and the data of the default
+school. Every other school has its own SQLite file, so writes in one campus
+never wait on another campus's write lock. A request is routed to a school
+by subdomain (``<slug>`` + SCHOOL_HOST_SUFFIX) or by the school chosen at
+login; TenantSession then sends all non-catalog queries to that school's
+engine. Engines are opened lazily on first use and keep a small connection
+pool per worker process.
+"""
+import os
+import re
+import threading
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, event, inspect
+
+DEFAULT_SCHOOL = 'default'
+SLUG_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,39}$')
+
+
+def is_valid_slug(slug):
+    return bool(slug) and SLUG_PATTERN.match(slug) is not None
+
+
+def current_school_slug():
+    """Slug of the school the current request (or CLI command) works on"""
+    if has_app_context():
+        return g.get('school', DEFAULT_SCHOOL)
+    return DEFAULT_SCHOOL
+
+
+def school_from_host(host, suffix):
+    """Return the school slug encoded in host, or None"""
+    if not suffix:
+        return None
+    hostname = host.split(':', 1)[0].lower()
+    if not hostname.endswith(suffix):
+        return None
+    slug = hostname[:-len(suffix)]
+    return slug if is_valid_slug(slug) else None
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+
+class SchoolEngines:
+    """Lazily created engine per school, shared by all requests of a worker"""
+
+    def __init__(self, database_dir, engine_options=None):
+        self.database_dir = database_dir
+        self.engine_options = engine_options or {}
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def database_uri(self, slug):
+        return 'sqlite:///' + os.path.join(self.database_dir, f'{slug}.db')
+
+    def get(self, slug):
+        engine = self._engines.get(slug)
+        if engine is not None:
+            return engine
+        with self._lock:
+            engine = self._engines.get(slug)
+            if engine is None:
+                os.makedirs(self.database_dir, exist_ok=True)
+                engine = create_engine(self.database_uri(slug), **self.engine_options)
+                event.listen(engine, 'connect', set_sqlite_pragmas)
+                self._engines[slug] = engine
+        return engine
+
+    def dispose_all(self, close=True):
+        """Drop all engines and their pooled connections.
+
+        In a freshly forked worker pass close=False: the inherited
+        connections belong to the parent and are only discarded.
+        """
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose(close=close)
+            self._engines.clear()
+
+
+class TenantSession(FlaskSession):
+    """Session that binds non-catalog models to the current school's engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            slug = current_school_slug()
+            if slug != DEFAULT_SCHOOL and not self._is_catalog(mapper):
+                return current_app.extensions['school_engines'].get(slug)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    @staticmethod
+    def _is_catalog(mapper):
+        if mapper is None:
+            return False
+        return getattr(inspect(mapper).class_, '__catalog__', False)
+
+
+def init_tenancy(app):
+    """Create the school engine registry from app config.
+
+    SCHOOL_DATABASE_DIR is where per-school databases live (default
+    instance/schools). SCHOOL_HOST_SUFFIX, e.g. '.edutrack.example.com',
+    enables routing by subdomain.
+    """
+    database_dir = app.config.get('SCHOOL_DATABASE_DIR') or os.path.join(app.instance_path, 'schools')
+    engine_options = {'pool_size': app.config.get('SCHOOL_POOL_SIZE', 5), 'pool_pre_ping': True}
+    engines = SchoolEngines(database_dir, engine_options)
+    app.extensions['school_engines'] = engines
+    return engines
@@ -0,0 +1,44 @@
+"""Shared fixtures: apps whose database, caches and archives live in a
+temporary directory, never in the repository's instance folder."""
+import pytest
+
+from app import create_app
+from seed import init_database, seed_demo_data
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory for apps sharing one temporary database, like worker processes"""
+    def make(**overrides):
+        config = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "school.db"}',
+            'SCHOOL_DATABASE_DIR': str(tmp_path / 'schools'),
+            'QUERY_CACHE_SYNC_DIR': str(tmp_path / 'query_cache'),
+            'ARCHIVE_DIR': str(tmp_path / 'archive'),
+            'RATELIMIT_ENABLED': False,
+        }
+        config.update(overrides)
+        return create_app(config)
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    """An app with the demo users and student"""
+    app = make_app()
+    with app.app_context():
+        init_database()
+        seed_demo_data()
+    return app
+
+
+@pytest.fixture
+def login():
+    """Return a function giving a test client logged in to an app"""
+    def log_in(app, username, password, role, **environ):
+        client = app.test_client()
+        client.post('/login', data={'username': username, 'password': password, 'role': role},
+                    environ_base=environ)
+        return client
+    return log_in
@@ -0,0 +1,111 @@
+"""Change feed cursors, compaction and visibility."""
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from changefeed import compact_change_feed
+from models import db, ChangeLog, Grade, Student, User
+
+
+def add_grade(student_id, subject):
+    grade = Grade(student_id=student_id, subject=subject, grade='A', semester='1')
+    db.session.add(grade)
+    db.session.commit()
+    return grade
+
+
+def age_entries(days, *criteria):
+    ChangeLog.query.filter(*criteria).update({'created_at': datetime.utcnow() - timedelta(days=days)})
+    db.session.commit()
+
+
+@pytest.fixture
+def two_families(app):
+    """A second teacher, parent and student besides the demo ones"""
+    with app.app_context():
+        users = [User(username=username, password_hash=generate_password_hash(username), role=role,
+                      email=f'{username}@school.com')
+                 for username, role in (('teacher2', 'teacher'), ('parent2', 'parent'))]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add(Student(student_id='STU002', name='Jane Roe', grade='4', section='B',
+                               teacher_id=users[0].id, parent_id=users[1].id))
+        db.session.commit()
+    return app
+
+
+def test_changes_after_cursor(app, login):
+    parent = login(app, 'parent1', 'parent123', 'parent')
+    cursor = parent.get('/changes').get_json()['cursor']
+    with app.app_context():
+        grade = add_grade(1, 'Math')
+        grade.grade = 'B'
+        db.session.commit()
+
+    page = parent.get(f'/changes?since={cursor}').get_json()
+    assert [(c['op'], c['data']['grade']) for c in page['changes']] == [('insert', 'A'), ('update', 'B')]
+    assert parent.get(f'/changes?since={page["cursor"]}').get_json()['changes'] == []
+
+
+def test_compaction_keeps_newest_entry_per_row(app, login):
+    parent = login(app, 'parent1', 'parent123', 'parent')
+    with app.app_context():
+        grade = add_grade(1, 'Math')
+        grade.grade = 'B'
+        db.session.commit()
+        age_entries(10)
+        assert compact_change_feed(older_than_days=7, retention_days=90) == (1, 0)
+
+    changes = parent.get('/changes?since=0').get_json()['changes']
+    assert [(c['op'], c['data']['grade']) for c in changes] == [('update', 'B')]
+
+
+def test_expired_cursor_must_resync(app, login):
+    parent = login(app, 'parent1', 'parent123', 'parent')
+    with app.app_context():
+        grade = add_grade(1, 'Math')
+        db.session.delete(grade)
+        db.session.commit()
+        age_entries(100)
+        assert compact_change_feed(older_than_days=7, retention_days=90) == (1, 1)
+        # Ids are never reused, even after the newest entries were dropped
+        add_grade(1, 'Science')
+
+    response = parent.get('/changes?since=0')
+    assert response.status_code == 410
+    assert response.get_json()['resync'] is True
+
+    cursor = parent.get('/changes').get_json()['cursor']
+    assert parent.get(f'/changes?since={cursor}').status_code == 200
+    changes = parent.get(f'/changes?since={int(cursor) - 1}').get_json()['changes']
+    assert [c['data']['subject'] for c in changes] == ['Science']
+
+
+def test_cursor_of_empty_feed_is_not_expired(app, login):
+    parent = login(app, 'parent1', 'parent123', 'parent')
+    with app.app_context():
+        add_grade(1, 'Math')
+        age_entries(100)
+        compact_change_feed(retention_days=90)
+        assert ChangeLog.query.count() == 0
+
+    cursor = parent.get('/changes').get_json()['cursor']
+    assert parent.get(f'/changes?since={cursor}').status_code == 200
+
+
+def test_users_only_see_their_students(two_families, login):
+    app = two_families
+    with app.app_context():
+        add_grade(1, 'Math')
+        add_grade(2, 'Art')
+
+    def subjects(client):
+        return [c['data']['subject'] for c in client.get('/changes?since=0').get_json()['changes']]
+
+    assert subjects(login(app, 'parent1', 'parent123', 'parent')) == ['Math']
+    assert subjects(login(app, 'parent2', 'parent2', 'parent')) == ['Art']
+    assert subjects(login(app, 'teacher1', 'teacher123', 'teacher')) == ['Math']
+    assert subjects(login(app, 'teacher2', 'teacher2', 'teacher')) == ['Art']
+    assert subjects(login(app, 'admin', 'admin123', 'admin')) == ['Math', 'Art']
+    assert app.test_client().get('/changes').status_code == 403
@@ -0,0 +1,28 @@
+"""Configuration loading."""
+import pytest
+
+from app import create_app
+from config import DEV_SECRET_KEY
+
+
+@pytest.fixture(autouse=True)
+def instance_dirs(monkeypatch, tmp_path):
+    # These apps are built from the environment alone; keep their files out of instance/
+    monkeypatch.setenv('EDUTRACK_QUERY_CACHE_SYNC_DIR', str(tmp_path / 'query_cache'))
+    monkeypatch.setenv('EDUTRACK_SCHOOL_DATABASE_DIR', str(tmp_path / 'schools'))
+
+
+def test_refuses_to_start_without_secret_key(monkeypatch):
+    monkeypatch.delenv('EDUTRACK_SECRET_KEY', raising=False)
+    with pytest.raises(RuntimeError, match='EDUTRACK_SECRET_KEY'):
+        create_app()
+
+
+def test_secret_key_from_environment(monkeypatch):
+    monkeypatch.setenv('EDUTRACK_SECRET_KEY', 'from-the-environment')
+    assert create_app().secret_key == 'from-the-environment'
+
+
+def test_development_key_only_when_debugging(monkeypatch):
+    monkeypatch.delenv('EDUTRACK_SECRET_KEY', raising=False)
+    assert create_app({'DEBUG': True}).secret_key == DEV_SECRET_KEY
@@ -0,0 +1,49 @@
+"""Attendance written for approved leave."""
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Attendance, LeaveRequest
+from views.portal import NON_SCHOOL_WEEKDAYS
+
+
+def request_leave(app, start, end):
+    with app.app_context():
+        leave = LeaveRequest(student_id=1, parent_id=3, teacher_id=2, leave_type='sick',
+                             start_date=start, end_date=end, reason='Fever')
+        db.session.add(leave)
+        db.session.commit()
+        return leave.id
+
+
+def leave_rows(app):
+    with app.app_context():
+        return {row.date: row.leave_request_id
+                for row in Attendance.query.filter_by(student_id=1).order_by(Attendance.date)}
+
+
+def test_withdrawn_approval_removes_untouched_rows(app, login):
+    start = date.today() + timedelta(days=7 - date.today().weekday())  # next Monday
+    leave_id = request_leave(app, start, start + timedelta(days=6))
+    teacher = login(app, 'teacher1', 'teacher123', 'teacher')
+
+    teacher.post('/update_leave_status', data={'leave_id': leave_id, 'status': 'approved'})
+    rows = leave_rows(app)
+    assert len(rows) == 6 and set(rows.values()) == {leave_id}
+
+    # The teacher marks the student present on Tuesday after all
+    teacher.post('/update_attendance', data={'student_id': 1, 'date': (start + timedelta(days=1)).isoformat(),
+                                             'hour': 1, 'present': 'true'})
+    teacher.post('/update_leave_status', data={'leave_id': leave_id, 'status': 'rejected'})
+    assert leave_rows(app) == {start + timedelta(days=1): None}
+
+
+@pytest.mark.skipif(date.today().weekday() in NON_SCHOOL_WEEKDAYS, reason='no attendance today')
+def test_dashboard_shows_leave_as_absence(app, login):
+    leave_id = request_leave(app, date.today(), date.today())
+    login(app, 'teacher1', 'teacher123', 'teacher').post(
+        '/update_leave_status', data={'leave_id': leave_id, 'status': 'approved'})
+
+    page = login(app, 'parent1', 'parent123', 'parent').get('/dashboard').get_data(as_text=True)
+    assert '<h3>On Leave</h3>' in page
+    assert '<h3>Present</h3>' not in page
@@ -0,0 +1,33 @@
+"""Query cache invalidation across worker processes."""
+from datetime import date
+
+import pytest
+
+from models import db, LeaveRequest, Student
+
+
+@pytest.fixture
+def workers(app, make_app):
+    """Two apps sharing one database, like two gunicorn workers"""
+    with app.app_context():
+        student = Student.query.first()
+        db.session.add(LeaveRequest(student_id=student.id, parent_id=student.parent_id,
+                                    teacher_id=student.teacher_id, leave_type='sick',
+                                    start_date=date.today(), end_date=date.today(), reason='Fever'))
+        db.session.commit()
+    return app, make_app()
+
+
+def test_commit_in_one_worker_invalidates_another(workers, login):
+    first, second = workers
+    parent = login(second, 'parent1', 'parent123', 'parent')
+    # Warm the second worker's cache with the pending leave
+    assert 'approved' not in parent.get('/api/v1/students/1/dashboard').get_data(as_text=True)
+    parent.get('/leave_requests')
+
+    teacher = login(first, 'teacher1', 'teacher123', 'teacher')
+    teacher.post('/update_leave_status', data={'leave_id': 1, 'status': 'approved'})
+
+    dashboard = parent.get('/api/v1/students/1/dashboard').get_json()
+    assert [leave['status'] for leave in dashboard['leave_requests']] == ['approved']
+    assert 'Approved' in parent.get('/leave_requests').get_data(as_text=True)
@@ -0,0 +1,64 @@
+"""Login throttling and rate-limit responses."""
+import pytest
+
+from ratelimit import MemoryBucketStore, SQLiteBucketStore, parse_rate
+from seed import init_database, seed_demo_data
+
+
+@pytest.fixture
+def limited_app(make_app):
+    app = make_app(RATELIMIT_ENABLED=True)
+    with app.app_context():
+        init_database()
+        seed_demo_data()
+    return app
+
+
+def attempt(client, password, ip, **headers):
+    return client.post('/login', data={'username': 'admin', 'password': password, 'role': 'admin'},
+                       environ_base={'REMOTE_ADDR': ip}, headers=headers)
+
+
+def test_failed_logins_elsewhere_do_not_lock_out_the_owner(limited_app):
+    client = limited_app.test_client()
+    statuses = [attempt(client, 'wrong', '10.0.0.1').status_code for _ in range(6)]
+    assert statuses == [302] * 5 + [429]
+
+    assert attempt(client, 'admin123', '10.0.0.2').status_code == 302
+    assert attempt(client, 'admin123', '10.0.0.1').status_code == 429
+
+
+def test_throttled_response_has_retry_after(limited_app):
+    client = limited_app.test_client()
+    for _ in range(5):
+        attempt(client, 'wrong', '10.0.0.1')
+
+    page = attempt(client, 'wrong', '10.0.0.1')
+    assert page.status_code == 429
+    assert 1 <= int(page.headers['Retry-After']) <= 12
+    assert 'Too Many Requests' in page.get_data(as_text=True)
+
+    api = attempt(client, 'wrong', '10.0.0.1', Accept='application/json')
+    assert api.status_code == 429
+    assert api.get_json()['retry_after'] == int(api.headers['Retry-After'])
+
+
+@pytest.mark.parametrize('make_store', [
+    lambda tmp_path: MemoryBucketStore(),
+    lambda tmp_path: SQLiteBucketStore(str(tmp_path / 'buckets.db')),
+])
+def test_bucket_refills_at_rate(make_store, tmp_path):
+    store = make_store(tmp_path)
+    capacity, rate = parse_rate('2/minute')
+    assert [store.consume('k', capacity, rate) for _ in range(2)] == [0, 0]
+    retry_after = store.consume('k', capacity, rate)
+    assert 29 < retry_after <= 30
+    assert store.consume('other', capacity, rate) == 0
+
+
+def test_sqlite_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'buckets.db')
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    capacity, rate = parse_rate('1/minute')
+    assert first.consume('login:user:admin@10.0.0.1', capacity, rate) == 0
+    assert second.consume('login:user:admin@10.0.0.1', capacity, rate) > 0
@@ -0,0 +1,32 @@
+"""Cached dashboards and ETags must never outlive a deleted student."""
+from werkzeug.security import generate_password_hash
+
+from models import db, Fee, Grade, Student, StudentVersion, User
+
+
+def test_reused_student_id_never_shows_deleted_data(app, login):
+    with app.app_context():
+        db.session.add(Grade(student_id=1, subject='SECRET-SUBJECT', grade='A', semester='1'))
+        db.session.commit()
+    parent = login(app, 'parent1', 'parent123', 'parent')
+    assert 'SECRET-SUBJECT' in parent.get('/dashboard').get_data(as_text=True)
+    etag = parent.get('/api/v1/students/1/dashboard').headers['ETag']
+
+    admin = login(app, 'admin', 'admin123', 'admin')
+    admin.post('/admin/delete_student/1')
+    with app.app_context():
+        assert db.session.get(StudentVersion, 1).version > 0
+        # Databases created before AUTOINCREMENT hand out the same ids again
+        db.session.add(User(id=3, username='parent2', password_hash=generate_password_hash('parent234'),
+                            role='parent', email='parent2@email.com'))
+        db.session.add(Student(id=1, student_id='STU002', name='Jane Roe', grade='4', section='B',
+                               parent_id=3, teacher_id=2))
+        db.session.commit()
+        db.session.add(Fee(student_id=1, fee_type='Tuition', amount=100, due_date=db.func.current_date()))
+        db.session.commit()
+
+    parent2 = login(app, 'parent2', 'parent234', 'parent')
+    assert 'SECRET-SUBJECT' not in parent2.get('/dashboard').get_data(as_text=True)
+    assert parent2.get('/api/v1/students/1/dashboard').headers['ETag'] != etag
+    teacher = login(app, 'teacher1', 'teacher123', 'teacher')
+    assert 'SECRET-SUBJECT' not in teacher.get('/dashboard').get_data(as_text=True)
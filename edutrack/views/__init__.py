@@ -0,0 +1,9 @@
+"""Blueprints of the portal, registered on the app by create_app()."""
+from views import admin, api, auth, messages, portal
+
+BLUEPRINTS = (auth.bp, portal.bp, messages.bp, admin.bp, api.bp)
+
+
+def register_blueprints(app):
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
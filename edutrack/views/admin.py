@@ -0,0 +1,435 @@
+"""Admin pages and APIs: users, students, credentials, cache statistics,
+the cross-school report and academic-year archival.
+"""
+import base64
+import json
+import sys
+
+from flask import Blueprint, flash, g, jsonify, redirect, render_template, request, session, url_for
+from sqlalchemy.orm import joinedload
+from werkzeug.security import generate_password_hash
+
+from archive import academic_year_label, list_archived_years, parse_academic_year
+from archiving import ARCHIVED_MODELS, archive_dir, archive_jobs, archive_store, is_closed_year, start_archive_job
+from models import db, User, Student, Attendance, delete_student_data
+from queries import get_query_cache, get_teachers
+from schools import cross_school_report
+from tenancy import DEFAULT_SCHOOL, current_school_slug
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+# Pagination helpers for the admin lists
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+def encode_cursor(values):
+    """Encode the last row's sort key as an opaque URL-safe cursor"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, or return None if it is invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    return values
+
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+def prefix_filter(column, prefix):
+    """Case-insensitive prefix match written as a range so SQLite can use a NOCASE index.
+
+    SQLite's NOCASE only folds ASCII letters, so e.g. 'é' still only matches 'é'.
+    """
+    column = column.collate('NOCASE')
+    # NOCASE compares lower-cased ASCII, so the bounds must be lower-cased too
+    prefix = prefix.translate(ASCII_LOWER)
+    # The first string after every string starting with prefix
+    upper = prefix.rstrip(chr(sys.maxunicode))
+    if not upper:
+        return column >= prefix
+    upper = upper[:-1] + chr(ord(upper[-1]) + 1)
+    return db.and_(column >= prefix, column < upper)
+
+def keyset_paginate(query, id_column, sort_columns, sort, cursor, per_page):
+    """Return one page of query ordered by sort, plus the cursor for the next page.
+
+    sort is a key of sort_columns, optionally prefixed with '-' for descending
+    order. Rows are ordered by (sort column, id) so the cursor stays stable
+    even when the sort column has duplicates.
+    """
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-')
+    column = sort_columns.get(sort_name, id_column)
+
+    last = decode_cursor(cursor)
+    if last is not None:
+        last_value, last_id = last
+        if column is id_column:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(db.or_(column < last_value,
+                                        db.and_(column == last_value, id_column < last_id)))
+        else:
+            query = query.filter(db.or_(column > last_value,
+                                        db.and_(column == last_value, id_column > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last_row = rows[-1]
+        next_cursor = encode_cursor([getattr(last_row, column.key), last_row.id])
+    return rows, next_cursor
+
+def get_page_size():
+    """Read the per_page query argument, clamped to a sane range"""
+    per_page = request.args.get('per_page', ADMIN_PAGE_SIZE, type=int)
+    return max(1, min(per_page, ADMIN_MAX_PAGE_SIZE))
+
+USER_SORT_COLUMNS = {'id': User.id, 'username': User.username, 'email': User.email, 'role': User.role}
+STUDENT_SORT_COLUMNS = {'id': Student.id, 'student_id': Student.student_id, 'name': Student.name,
+                        'grade': Student.grade, 'section': Student.section}
+
+def admin_user_page():
+    """Filtered, sorted page of users for the admin lists"""
+    query = User.query
+    q = request.args.get('q', '').strip()
+    role = request.args.get('role', '').strip()
+    if q:
+        query = query.filter(prefix_filter(User.username, q))
+    if role:
+        query = query.filter(User.role == role)
+    sort = request.args.get('sort', 'id')
+    return keyset_paginate(query, User.id, USER_SORT_COLUMNS, sort,
+                           request.args.get('after'), get_page_size())
+
+def admin_student_page():
+    """Filtered, sorted page of students with parent and teacher eager-loaded"""
+    query = Student.query.options(joinedload(Student.parent), joinedload(Student.teacher))
+    q = request.args.get('q', '').strip()
+    grade = request.args.get('grade', '').strip()
+    section = request.args.get('section', '').strip()
+    if q:
+        query = query.filter(db.or_(prefix_filter(Student.student_id, q),
+                                    prefix_filter(Student.name, q)))
+    if grade:
+        query = query.filter(prefix_filter(Student.grade, grade))
+    if section:
+        query = query.filter(prefix_filter(Student.section, section))
+    sort = request.args.get('sort', 'id')
+    return keyset_paginate(query, Student.id, STUDENT_SORT_COLUMNS, sort,
+                           request.args.get('after'), get_page_size())
+
+def user_to_dict(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'role': user.role,
+        'created_at': user.created_at.isoformat() if user.created_at else None
+    }
+
+def student_to_dict(student):
+    return {
+        'id': student.id,
+        'student_id': student.student_id,
+        'name': student.name,
+        'grade': student.grade,
+        'section': student.section,
+        'parent': student.parent.username if student.parent else None,
+        'teacher': student.teacher.username if student.teacher else None
+    }
+
+# Admin Routes
+@bp.route('')
+def admin_dashboard():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.index'))
+    
+    # Get statistics
+    total_students = Student.query.count()
+    total_teachers = User.query.filter_by(role='teacher').count()
+    total_parents = User.query.filter_by(role='parent').count()
+    total_attendance_records = Attendance.query.count()
+    
+    return render_template('admin_dashboard.html',
+                         total_students=total_students,
+                         total_teachers=total_teachers,
+                         total_parents=total_parents,
+                         total_attendance_records=total_attendance_records)
+
+@bp.route('/users')
+def admin_users():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.index'))
+    
+    users, next_cursor = admin_user_page()
+    return render_template('admin_users.html', users=users, next_cursor=next_cursor)
+
+@bp.route('/api/users')
+def admin_api_users():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    users, next_cursor = admin_user_page()
+    rows_template = request.args.get('rows')
+    return jsonify({
+        'items': [user_to_dict(u) for u in users],
+        'next_cursor': next_cursor,
+        'html': render_template('admin_user_rows.html', users=users,
+                                credentials=rows_template == 'credentials') if rows_template else None
+    })
+
+@bp.route('/students')
+def admin_students():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.index'))
+    
+    students, next_cursor = admin_student_page()
+    teachers = get_teachers()
+    return render_template('admin_students.html', students=students, teachers=teachers, next_cursor=next_cursor)
+
+@bp.route('/api/students')
+def admin_api_students():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    students, next_cursor = admin_student_page()
+    return jsonify({
+        'items': [student_to_dict(s) for s in students],
+        'next_cursor': next_cursor,
+        'html': render_template('admin_student_rows.html', students=students) if request.args.get('rows') else None
+    })
+
+@bp.route('/api/cache_stats')
+def admin_api_cache_stats():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(get_query_cache().stats())
+
+@bp.route('/add_user', methods=['POST'])
+def admin_add_user():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    username = request.form.get('username')
+    password = request.form.get('password')
+    role = request.form.get('role')
+    email = request.form.get('email')
+    
+    if not all([username, password, role, email]):
+        flash('All fields are required!', 'error')
+        return redirect(url_for('admin.admin_users'))
+    
+    # Check if username already exists
+    if User.query.filter_by(username=username).first():
+        flash('Username already exists!', 'error')
+        return redirect(url_for('admin.admin_users'))
+    
+    try:
+        new_user = User(
+            username=username,
+            password_hash=generate_password_hash(password),
+            plain_password=password,  # Store plain password
+            role=role,
+            email=email
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        flash('User added successfully!', 'success')
+    except Exception as e:
+        flash('Error adding user!', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('admin.admin_users'))
+
+@bp.route('/add_student', methods=['POST'])
+def admin_add_student():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    student_id = request.form.get('student_id')
+    name = request.form.get('name')
+    grade = request.form.get('grade')
+    section = request.form.get('section')
+    parent_username = request.form.get('parent_username')
+    teacher_id = request.form.get('teacher_id')
+    
+    if not all([student_id, name, grade, section, parent_username, teacher_id]):
+        flash('All fields are required!', 'error')
+        return redirect(url_for('admin.admin_students'))
+    
+    # Check if student ID already exists
+    if Student.query.filter_by(student_id=student_id).first():
+        flash('Student ID already exists!', 'error')
+        return redirect(url_for('admin.admin_students'))
+    
+    # Get parent user
+    parent = User.query.filter_by(username=parent_username, role='parent').first()
+    if not parent:
+        flash('Parent username not found!', 'error')
+        return redirect(url_for('admin.admin_students'))
+    
+    try:
+        new_student = Student(
+            student_id=student_id,
+            name=name,
+            grade=grade,
+            section=section,
+            parent_id=parent.id,
+            teacher_id=int(teacher_id)
+        )
+        db.session.add(new_student)
+        db.session.commit()
+        session['last_added_student'] = {
+            'student_id': student_id,
+            'student_name': name,
+            'parent_username': parent_username,
+            'parent_password': parent.password_hash
+        }
+        flash('Student added successfully!', 'success')
+    except Exception as e:
+        flash('Error adding student!', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('admin.admin_credentials'))
+
+@bp.route('/delete_user/<int:user_id>', methods=['POST'])
+def admin_delete_user(user_id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    user = User.query.get(user_id)
+    if not user:
+        flash('User not found!', 'error')
+        return redirect(url_for('admin.admin_users'))
+    
+    if user.role == 'admin':
+        flash('Admin user cannot be deleted!', 'error')
+        return redirect(url_for('admin.admin_users'))
+    
+    try:
+        # Delete related records first
+        if user.role == 'parent':
+            # Delete students associated with this parent
+            students = Student.query.filter_by(parent_id=user.id).all()
+            for student in students:
+                # Delete related records
+                delete_student_data(student.id)
+            Student.query.filter_by(parent_id=user.id).delete()
+        
+        elif user.role == 'teacher':
+            # Reassign students to another teacher or delete them
+            students = Student.query.filter_by(teacher_id=user.id).all()
+            for student in students:
+                student.teacher_id = 1  # Assign to first teacher or handle differently
+        
+        # Delete the user
+        db.session.delete(user)
+        db.session.commit()
+        flash('User deleted successfully!', 'success')
+    except Exception as e:
+        flash('Error deleting user!', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('admin.admin_users'))
+
+@bp.route('/delete_student/<int:student_id>', methods=['POST'])
+def admin_delete_student(student_id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    student = Student.query.get(student_id)
+    if not student:
+        flash('Student not found!', 'error')
+        return redirect(url_for('admin.admin_students'))
+    
+    try:
+        # Delete related records
+        delete_student_data(student.id)
+        parent_id = student.parent_id
+        # Delete the student
+        db.session.delete(student)
+        db.session.commit()
+        # After deleting the student, check if parent has any more students
+        remaining_students = Student.query.filter_by(parent_id=parent_id).count()
+        if remaining_students == 0:
+            parent_user = User.query.get(parent_id)
+            if parent_user:
+                db.session.delete(parent_user)
+                db.session.commit()
+        flash('Student (and parent if no more students) deleted successfully!', 'success')
+    except Exception as e:
+        flash('Error deleting student!', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('admin.admin_students'))
+
+@bp.route('/credentials')
+def admin_credentials():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.index'))
+    
+    users, next_cursor = admin_user_page()
+    last_added_student = session.pop('last_added_student', None)
+    return render_template('admin_credentials.html', users=users, next_cursor=next_cursor, last_added_student=last_added_student)
+
+@bp.route('/delete_all_users', methods=['POST'])
+def admin_delete_all_users():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    try:
+        User.query.filter(User.role != 'admin').delete(synchronize_session=False)
+        db.session.commit()
+        flash('All users except admin have been deleted!', 'success')
+    except Exception as e:
+        flash('Error deleting users!', 'error')
+        db.session.rollback()
+    return redirect(url_for('admin.admin_credentials'))
+
+@bp.route('/api/schools/report')
+def admin_api_school_report():
+    # Only the main campus's admin may see other schools
+    if 'user_id' not in session or session['role'] != 'admin' or g.school != DEFAULT_SCHOOL:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({'schools': cross_school_report()})
+
+@bp.route('/archive', methods=['POST'])
+def admin_archive():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    start_year = parse_academic_year(request.form.get('year', ''))
+    if start_year is None or not is_closed_year(start_year):
+        return jsonify({'error': 'Only a finished academic year (e.g. 2023-24) can be archived'}), 400
+    if not start_archive_job(start_year):
+        return jsonify({'error': 'Archival of this year is already running'}), 409
+    return jsonify({'success': True, 'year': academic_year_label(start_year)}), 202
+
+@bp.route('/api/archive')
+def admin_api_archive():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    school = current_school_slug()
+    years = []
+    for label in list_archived_years(archive_dir()):
+        store = archive_store(parse_academic_year(label))
+        years.append({
+            'year': label,
+            'archived_at': store.get_meta('archived_at'),
+            'rows': {table: store.count(table) for _, _, table in ARCHIVED_MODELS}
+        })
+        store.close()
+    jobs = {label: job for (job_school, label), job in archive_jobs.items() if job_school == school}
+    return jsonify({'archives': years, 'jobs': jobs})
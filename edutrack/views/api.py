@@ -0,0 +1,191 @@
+"""JSON API for the mobile and offline clients: the parent API (v1) and
+the change feed.
+"""
+from datetime import date
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request, session
+
+from changefeed import (CHANGE_FEED_MAX_PAGE_SIZE, CHANGE_FEED_PAGE_SIZE, change_feed_horizon, change_to_dict,
+                        visible_student_ids_query)
+from models import db, Student, Attendance, Grade, Fee, StudentVersion, ChangeLog
+from queries import FamilyOverview, family_data_version, family_students, get_pending_fees, get_student_leave_requests
+from tenancy import current_school_slug
+
+bp = Blueprint('api', __name__)
+
+# Parent JSON API (v1)
+# Every student resource carries an ETag built from the student's change
+# counter, so unchanged data is answered with 304 before any data queries run.
+API_CACHE_CONTROL = 'private, no-cache'
+
+def api_parent_student(student_id):
+    """Return (student, version) for one of the logged-in parent's students, or None"""
+    row = db.session.query(Student, StudentVersion.version).outerjoin(
+        StudentVersion, StudentVersion.student_id == Student.id
+    ).filter(Student.id == student_id, Student.parent_id == session['user_id']).first()
+    if row is None:
+        return None
+    student, version = row
+    return student, version or 0
+
+def api_etag(resource, student, version, *extra):
+    parts = ['v1', current_school_slug(), resource, str(student.id), str(version)] + [str(e) for e in extra]
+    return '-'.join(parts)
+
+def api_response(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = API_CACHE_CONTROL
+    return response
+
+def api_not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = API_CACHE_CONTROL
+    return response
+
+def parent_api(resource, date_bound=False):
+    """Decorator for parent API views taking a student.
+
+    Handles authentication, ownership, ETag computation and If-None-Match
+    before the view runs. Views whose content depends on today's date set
+    date_bound so their ETag rolls over at midnight.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(student_id):
+            if 'user_id' not in session or session['role'] != 'parent':
+                return jsonify({'error': 'Unauthorized'}), 403
+            found = api_parent_student(student_id)
+            if found is None:
+                return jsonify({'error': 'Student not found'}), 404
+            student, version = found
+            extra = [date.today().isoformat()] if date_bound else []
+            etag = api_etag(resource, student, version, *extra)
+            if request.if_none_match.contains_weak(etag):
+                return api_not_modified(etag)
+            return api_response(view(student), etag)
+        return wrapper
+    return decorator
+
+def student_summary(student):
+    return {'id': student.id, 'student_id': student.student_id, 'name': student.name,
+            'grade': student.grade, 'section': student.section}
+
+def attendance_to_dict(record):
+    return {'date': record.date.isoformat(),
+            'hours': [bool(getattr(record, f'hour_{h}')) for h in range(1, 9)]}
+
+def grade_to_dict(grade):
+    return {'id': grade.id, 'subject': grade.subject, 'grade': grade.grade, 'marks': grade.marks,
+            'semester': grade.semester, 'created_at': grade.created_at.isoformat()}
+
+def fee_to_dict(fee):
+    return {'id': fee.id, 'fee_type': fee.fee_type, 'amount': fee.amount,
+            'due_date': fee.due_date.isoformat(), 'paid': fee.paid,
+            'paid_date': fee.paid_date.isoformat() if fee.paid_date else None}
+
+def leave_to_dict(leave):
+    return {'id': leave.id, 'leave_type': leave.leave_type, 'start_date': leave.start_date.isoformat(),
+            'end_date': leave.end_date.isoformat(), 'reason': leave.reason, 'status': leave.status,
+            'teacher_comment': leave.teacher_comment, 'created_at': leave.created_at.isoformat()}
+
+def family_child_to_dict(student, overview):
+    attendance = overview.attendance.get(student.id)
+    fee_count, fee_total = overview.outstanding_fees[student.id]
+    return {
+        'student': student_summary(student),
+        'attendance': attendance_to_dict(attendance) if attendance else None,
+        'grades': [grade_to_dict(g) for g in overview.recent_grades[student.id]],
+        'outstanding_fees': {'count': fee_count, 'total': fee_total},
+        'pending_leaves': [leave_to_dict(l) for l in overview.pending_leaves[student.id]]
+    }
+
+@bp.route('/api/v1/family')
+def api_family():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return jsonify({'error': 'Unauthorized'}), 403
+    rows = family_students(session['user_id'])
+    # Any child's change counter (or a new day) changes the family's ETag
+    etag = '-'.join(['v1', current_school_slug(), 'family', str(session['user_id']),
+                     family_data_version(rows), date.today().isoformat()])
+    if request.if_none_match.contains_weak(etag):
+        return api_not_modified(etag)
+    students = [student for student, _ in rows]
+    overview = FamilyOverview(students)
+    return api_response({'children': [family_child_to_dict(s, overview) for s in students]}, etag)
+
+@bp.route('/api/v1/students')
+def api_students():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return jsonify({'error': 'Unauthorized'}), 403
+    students = Student.query.filter_by(parent_id=session['user_id']).order_by(Student.id).all()
+    return jsonify({'students': [student_summary(s) for s in students]})
+
+@bp.route('/api/v1/students/<int:student_id>/dashboard')
+@parent_api('dashboard', date_bound=True)
+def api_dashboard(student):
+    today_attendance = Attendance.query.filter_by(student_id=student.id, date=date.today()).first()
+    recent_grades = Grade.query.filter_by(student_id=student.id).order_by(Grade.created_at.desc()).limit(5).all()
+    pending_fees = get_pending_fees(student.id)
+    leave_requests = get_student_leave_requests(student.id)
+    return {
+        'student': student_summary(student),
+        'attendance': attendance_to_dict(today_attendance) if today_attendance else None,
+        'grades': [grade_to_dict(g) for g in recent_grades],
+        'fees': [fee_to_dict(f) for f in pending_fees],
+        'leave_requests': [leave_to_dict(l) for l in leave_requests]
+    }
+
+@bp.route('/api/v1/students/<int:student_id>/attendance')
+@parent_api('attendance', date_bound=True)
+def api_attendance(student):
+    current_month = date.today().replace(day=1)
+    records = Attendance.query.filter(
+        Attendance.student_id == student.id,
+        Attendance.date >= current_month
+    ).order_by(Attendance.date.desc()).all()
+    return {'student_id': student.id, 'attendance': [attendance_to_dict(r) for r in records]}
+
+@bp.route('/api/v1/students/<int:student_id>/grades')
+@parent_api('grades')
+def api_grades(student):
+    grades = Grade.query.filter_by(student_id=student.id).order_by(Grade.created_at.desc()).all()
+    return {'student_id': student.id, 'grades': [grade_to_dict(g) for g in grades]}
+
+@bp.route('/api/v1/students/<int:student_id>/fees')
+@parent_api('fees')
+def api_fees(student):
+    fees = Fee.query.filter_by(student_id=student.id).order_by(Fee.due_date.desc()).all()
+    return {'student_id': student.id, 'fees': [fee_to_dict(f) for f in fees]}
+
+@bp.route('/changes')
+def changes():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    since = request.args.get('since')
+    if since is None:
+        # No cursor: hand out the current position to start syncing from
+        # (the horizon, if compaction expired every entry)
+        latest = db.session.query(db.func.max(ChangeLog.id)).scalar() or 0
+        latest = max(latest, change_feed_horizon())
+        return jsonify({'changes': [], 'cursor': str(latest), 'has_more': False})
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    if since < change_feed_horizon():
+        return jsonify({'error': 'Cursor expired', 'resync': True}), 410
+
+    limit = max(1, min(request.args.get('limit', CHANGE_FEED_PAGE_SIZE, type=int), CHANGE_FEED_MAX_PAGE_SIZE))
+    query = ChangeLog.query.filter(ChangeLog.id > since)
+    visible = visible_student_ids_query()
+    if visible is not None:
+        query = query.filter(ChangeLog.student_id.in_(visible))
+    rows = query.order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    cursor = rows[-1].id if rows else since
+    return jsonify({'changes': [change_to_dict(c) for c in rows], 'cursor': str(cursor), 'has_more': has_more})
@@ -0,0 +1,85 @@
+"""Login, logout and the error pages shared by all views."""
+from flask import Blueprint, current_app, flash, g, jsonify, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash
+
+from models import User
+from ratelimit import rate_limit
+from schools import host_school, school_exists
+
+bp = Blueprint('auth', __name__)
+
+@bp.route('/')
+def index():
+    if 'user_id' in session:
+        return redirect(url_for('portal.dashboard'))
+    return render_template('index.html', school_from_host=host_school())
+
+# Throttled and shed requests (see ratelimit.py) fail fast with a
+# Retry-After header; API clients get JSON, browsers a short page
+def wants_json():
+    return (request.path.startswith(('/api/', '/admin/api/', '/changes'))
+            or request.accept_mimetypes.best == 'application/json')
+
+def retry_later_response(e, title, message):
+    if wants_json():
+        response = jsonify({'error': message, 'retry_after': e.retry_after})
+    else:
+        response = current_app.response_class(render_template('error.html', title=title, message=message))
+    response.status_code = e.code
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@bp.app_errorhandler(429)
+def too_many_requests(e):
+    return retry_later_response(e, 'Too Many Requests', 'Too many attempts. Please wait a moment and try again.')
+
+@bp.app_errorhandler(503)
+def service_unavailable(e):
+    return retry_later_response(e, 'Server Busy', 'The portal is busy right now. Please try again in a moment.')
+
+def login_attempt_key():
+    # Per username *and* client, so nobody can lock others out of an account
+    username = (request.form.get('username') or '').strip().lower()
+    return f'{username}@{request.remote_addr}' if username else None
+
+@bp.route('/login', methods=['POST'])
+@rate_limit('login', ip='20/minute', user='5/minute', user_key=login_attempt_key)
+def login():
+    username = request.form.get('username')
+    password = request.form.get('password')
+    role = request.form.get('role')
+    
+    if not username or not password or not role:
+        flash('All fields are required!', 'error')
+        return redirect(url_for('auth.index'))
+    
+    # Outside a school subdomain, the school is picked on the login form
+    school = (request.form.get('school') or '').strip().lower()
+    if school and host_school() is None:
+        if not school_exists(school):
+            flash('Invalid credentials!', 'error')
+            return redirect(url_for('auth.index'))
+        g.school = school
+    
+    user = User.query.filter_by(username=username, role=role).first()
+    
+    if user and check_password_hash(user.password_hash, password):
+        session['school'] = g.school
+        session['user_id'] = user.id
+        session['username'] = user.username
+        session['role'] = user.role
+        
+        if role == 'admin':
+            return redirect(url_for('admin.admin_dashboard'))
+        else:
+            return redirect(url_for('portal.dashboard'))
+    else:
+        flash('Invalid credentials!', 'error')
+        return redirect(url_for('auth.index'))
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    flash('Logged out successfully!', 'success')
+    return redirect(url_for('auth.index'))
@@ -0,0 +1,180 @@
+"""Messaging between parents and teachers."""
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+from localtime import utc_to_local
+from models import db, User, Student, Message
+from queries import get_user
+from ratelimit import rate_limit
+
+bp = Blueprint('messages', __name__)
+
+# Route for parent to contact teacher
+@bp.route('/contact_teacher', methods=['GET', 'POST'])
+@rate_limit('contact_teacher', ip='60/minute', user='10/minute')
+def contact_teacher():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return redirect(url_for('auth.index'))
+    parent_id = session['user_id']
+    students = Student.query.filter_by(parent_id=parent_id).all()
+    if not students:
+        flash('Student not found!', 'error')
+        return redirect(url_for('portal.dashboard'))
+    # Get selected student_id from query or form
+    if request.method == 'POST':
+        selected_student_id = request.form.get('student_id')
+    else:
+        selected_student_id = request.args.get('student_id')
+    if not selected_student_id:
+        selected_student_id = str(students[0].id)
+    selected_student = next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+    teacher = get_user(selected_student.teacher_id)
+    if request.method == 'POST':
+        content = request.form.get('content')
+        if not content:
+            flash('Message cannot be empty!', 'error')
+            return redirect(url_for('messages.contact_teacher', student_id=selected_student.id))
+        message = Message(
+            sender_id=parent_id,
+            receiver_id=teacher.id,
+            student_id=selected_student.id,
+            content=content
+        )
+        db.session.add(message)
+        db.session.commit()
+        flash('Message sent to teacher!', 'success')
+        return redirect(url_for('messages.contact_teacher', student_id=selected_student.id))
+    # Show message history
+    messages = Message.query.filter_by(student_id=selected_student.id).order_by(Message.timestamp.asc()).all()
+    return render_template('contact_teacher.html', teacher=teacher, student=selected_student, students=students, messages=messages)
+
+# Route for teacher to view and reply to messages
+@bp.route('/messages', methods=['GET', 'POST'])
+@rate_limit('messages', ip='60/minute', user='20/minute')
+def teacher_messages():
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('auth.index'))
+    teacher_id = session['user_id']
+    # Get all students assigned to this teacher
+    students = Student.query.filter_by(teacher_id=teacher_id).all()
+    student_ids = [s.id for s in students]
+    
+    # Get selected parent from query parameter
+    selected_parent_id = request.args.get('parent_id')
+    
+    # Build parent chats list
+    parent_chats = []
+    try:
+        # Get ALL parents associated with this teacher's students
+        parent_ids = set()
+        for student in students:
+            parent_ids.add(student.parent_id)
+        
+        for parent_id in parent_ids:
+            parent = User.query.get(parent_id)
+            if parent:
+                # Get the student for this parent
+                student = Student.query.filter_by(parent_id=parent_id, teacher_id=teacher_id).first()
+                
+                # Get messages between this parent and teacher
+                parent_messages = Message.query.filter(
+                    Message.student_id.in_(student_ids),
+                    ((Message.sender_id == parent_id) & (Message.receiver_id == teacher_id)) |
+                    ((Message.sender_id == teacher_id) & (Message.receiver_id == parent_id))
+                ).order_by(Message.timestamp.desc()).all()
+                
+                # Count unread messages (messages from parent to teacher that are unread)
+                unread_count = Message.query.filter(
+                    Message.sender_id == parent_id,
+                    Message.receiver_id == teacher_id,
+                    Message.is_read == False
+                ).count()
+                
+                # Determine last message and time
+                if parent_messages:
+                    last_message = parent_messages[0]
+                    last_message_text = last_message.content
+                    # Convert UTC to local time
+                    local_time = utc_to_local(last_message.timestamp)
+                    last_message_time = local_time.strftime('%H:%M')
+                    has_messages = True
+                else:
+                    last_message_text = "No messages yet"
+                    last_message_time = ""
+                    has_messages = False
+                
+                # Check if the last message is from parent (unreplied) or teacher (replied)
+                is_unreplied = False
+                if parent_messages:
+                    last_message = parent_messages[0]
+                    is_unreplied = (last_message.sender_id == parent_id and last_message.receiver_id == teacher_id)
+                
+                parent_chats.append({
+                    'parent_id': parent_id,
+                    'parent_name': parent.username,
+                    'student_name': student.name if student else 'Unknown',
+                    'student_id': student.id if student else None,
+                    'last_message': last_message_text,
+                    'last_time': last_message_time,
+                    'unread_count': unread_count,
+                    'has_messages': has_messages,
+                    'is_unreplied': is_unreplied,
+                    'messages': parent_messages[::-1] if parent_messages else []  # Reverse to show in chronological order
+                })
+        
+        # Sort parent chats: unreplied messages first, then by last message time
+        parent_chats.sort(key=lambda x: (not x['is_unreplied'], x['last_time'] if x['last_time'] else ''), reverse=True)
+        
+    except Exception as e:
+        # If there's any error, just continue with empty list
+        parent_chats = []
+    
+    # Get selected parent data
+    selected_parent = None
+    if selected_parent_id:
+        for chat in parent_chats:
+            if str(chat['parent_id']) == str(selected_parent_id):
+                selected_parent = chat
+                # Mark messages as read when teacher views the chat
+                # (row by row so each change reaches the change feed)
+                try:
+                    unread = Message.query.filter(
+                        Message.sender_id == int(selected_parent_id),
+                        Message.receiver_id == teacher_id,
+                        Message.is_read == False
+                    ).all()
+                    for message in unread:
+                        message.is_read = True
+                    db.session.commit()
+                except Exception as e:
+                    # If there's an error, just continue
+                    pass
+                break
+    
+    if request.method == 'POST':
+        reply_content = request.form.get('reply_content')
+        parent_id = request.form.get('parent_id')
+        student_id = request.form.get('student_id')
+        
+        if reply_content and parent_id and student_id:
+            try:
+                reply = Message(
+                    sender_id=teacher_id,
+                    receiver_id=int(parent_id),
+                    student_id=int(student_id),
+                    content=reply_content
+                )
+                db.session.add(reply)
+                db.session.commit()
+                flash('Message sent!', 'success')
+                return redirect(url_for('messages.teacher_messages', parent_id=parent_id))
+            except Exception as e:
+                flash('Error sending message!', 'error')
+        else:
+            flash('Missing required information!', 'error')
+        
+        return redirect(url_for('messages.teacher_messages', parent_id=selected_parent_id))
+    
+    return render_template('teacher_messages.html', 
+                         parent_chats=parent_chats, 
+                         selected_parent=selected_parent,
+                         students=students)
@@ -0,0 +1,474 @@
+"""Parent and teacher pages: dashboards, attendance, grades, fees, leave
+requests and archived academic years.
+"""
+import csv
+import io
+from datetime import datetime, date, timedelta
+
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, session, url_for
+
+from archive import academic_year_label, list_archived_years, parse_academic_year, unpack_hours
+from archiving import archive_dir, archive_store
+from models import db, User, Student, Attendance, Grade, Fee, LeaveRequest, delete_with_changes, insert_with_changes
+from queries import (FamilyOverview, ParentPanels, TeacherPanels, family_data_version, family_students,
+                     get_student_leave_requests, get_teacher_leave_requests, student_data_version,
+                     students_on_leave, teacher_data_version)
+
+bp = Blueprint('portal', __name__)
+
+@bp.route('/dashboard')
+def dashboard():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.index'))
+    
+    user_id = session['user_id']
+    role = session['role']
+    
+    if role == 'parent':
+        students = Student.query.filter_by(parent_id=user_id).all()
+        if not students:
+            flash('No student found for this parent account!', 'error')
+            return redirect(url_for('auth.index'))
+        # Determine selected student
+        selected_student_id = request.args.get('student_id')
+        if not selected_student_id and students:
+            selected_student_id = str(students[0].id)
+        selected_student = next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+        return render_template('parent_dashboard.html', students=students, selected_student=selected_student,
+                               panels=ParentPanels(selected_student),
+                               data_version=student_data_version(selected_student.id), today=date.today())
+    
+    elif role == 'teacher':
+        return render_template('teacher_dashboard.html',
+                             panels=TeacherPanels(user_id),
+                             data_version=teacher_data_version(user_id))
+    
+    return redirect(url_for('auth.index'))
+
+@bp.route('/family')
+def family():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return redirect(url_for('auth.index'))
+    
+    # All children side by side; see FamilyOverview for the query budget
+    rows = family_students(session['user_id'])
+    students = [student for student, _ in rows]
+    return render_template('family_overview.html', students=students, overview=FamilyOverview(students),
+                           data_version=family_data_version(rows), today=date.today())
+
+@bp.route('/attendance')
+def attendance():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.index'))
+    
+    user_id = session['user_id']
+    role = session['role']
+    
+    if role == 'parent':
+        students = Student.query.filter_by(parent_id=user_id).all()
+        if not students:
+            return redirect(url_for('auth.index'))
+        selected_student_id = request.args.get('student_id')
+        if not selected_student_id:
+            selected_student_id = str(students[0].id)
+        selected_student = next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+        current_month = date.today().replace(day=1)
+        attendance_records = Attendance.query.filter(
+            Attendance.student_id == selected_student.id,
+            Attendance.date >= current_month
+        ).order_by(Attendance.date.desc()).all()
+        return render_template('attendance.html', students=students, selected_student=selected_student, attendance_records=attendance_records)
+    
+    elif role == 'teacher':
+        students = Student.query.filter_by(teacher_id=user_id).all()
+        selected_date = request.args.get('date', date.today().strftime('%Y-%m-%d'))
+        
+        # Get attendance for all students on selected date
+        attendance_data = {}
+        for student in students:
+            attendance = Attendance.query.filter_by(
+                student_id=student.id, 
+                date=datetime.strptime(selected_date, '%Y-%m-%d').date()
+            ).first()
+            attendance_data[student.id] = attendance
+        
+        # Students on approved leave are shown as such, with all hours absent
+        leave_data = students_on_leave(datetime.strptime(selected_date, '%Y-%m-%d').date(), user_id)
+        
+        return render_template('teacher_attendance.html', 
+                             students=students, 
+                             attendance_data=attendance_data,
+                             leave_data=leave_data,
+                             selected_date=selected_date)
+    
+    return redirect(url_for('auth.index'))
+
+@bp.route('/update_attendance', methods=['POST'])
+def update_attendance():
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    student_id = request.form.get('student_id')
+    date_str = request.form.get('date')
+    hour = request.form.get('hour')
+    present = request.form.get('present') == 'true'
+    
+    if not student_id or not date_str or not hour:
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    try:
+        attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        
+        attendance = Attendance.query.filter_by(
+            student_id=int(student_id), 
+            date=attendance_date
+        ).first()
+        
+        if not attendance:
+            attendance = Attendance(
+                student_id=int(student_id),
+                date=attendance_date
+            )
+            db.session.add(attendance)
+        
+        # Update the specific hour; a row written for a leave is now the teacher's
+        setattr(attendance, f'hour_{hour}', present)
+        attendance.leave_request_id = None
+        
+        db.session.commit()
+        return jsonify({'success': True})
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': 'Invalid data provided'}), 400
+
+@bp.route('/grades')
+def grades():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.index'))
+    
+    user_id = session['user_id']
+    role = session['role']
+    
+    if role == 'parent':
+        students = Student.query.filter_by(parent_id=user_id).all()
+        if not students:
+            return redirect(url_for('auth.index'))
+        selected_student_id = request.args.get('student_id')
+        if not selected_student_id:
+            selected_student_id = str(students[0].id)
+        selected_student = next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+        grades = Grade.query.filter_by(student_id=selected_student.id).order_by(Grade.created_at.desc()).all()
+        return render_template('grades.html', students=students, selected_student=selected_student, grades=grades)
+    
+    elif role == 'teacher':
+        students = Student.query.filter_by(teacher_id=user_id).all()
+        return render_template('teacher_grades.html', students=students)
+    
+    return redirect(url_for('auth.index'))
+
+@bp.route('/add_grade', methods=['POST'])
+def add_grade():
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    student_id = request.form.get('student_id')
+    subject = request.form.get('subject')
+    grade = request.form.get('status')
+    marks = request.form.get('marks')
+    semester = request.form.get('semester')
+    
+    if not all([student_id, subject, grade, semester]):
+        flash('All fields are required!', 'error')
+        return redirect(url_for('portal.grades'))
+    
+    try:
+        marks_value = int(marks) if marks and str(marks).strip() else None
+        
+        new_grade = Grade(
+            student_id=int(student_id),
+            subject=subject,
+            grade=grade,
+            marks=marks_value,
+            semester=semester
+        )
+        
+        db.session.add(new_grade)
+        db.session.commit()
+        
+        flash('Grade added successfully!', 'success')
+    except (ValueError, TypeError) as e:
+        flash('Invalid data provided!', 'error')
+        db.session.rollback()
+    
+    return redirect(url_for('portal.grades'))
+
+@bp.route('/fees')
+def fees():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.index'))
+    
+    user_id = session['user_id']
+    role = session['role']
+    
+    if role == 'parent':
+        students = Student.query.filter_by(parent_id=user_id).all()
+        if not students:
+            return redirect(url_for('auth.index'))
+        selected_student_id = request.args.get('student_id')
+        if not selected_student_id:
+            selected_student_id = str(students[0].id)
+        selected_student = next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+        fees = Fee.query.filter_by(student_id=selected_student.id).order_by(Fee.due_date.desc()).all()
+        return render_template('fees.html', students=students, selected_student=selected_student, fees=fees)
+    
+    elif role == 'teacher':
+        students = Student.query.filter_by(teacher_id=user_id).all()
+        return render_template('teacher_fees.html', students=students)
+    
+    return redirect(url_for('auth.index'))
+
+@bp.route('/add_fee', methods=['POST'])
+def add_fee():
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+    student_id = request.form.get('student_id')
+    fee_type = request.form.get('fee_type')
+    amount = request.form.get('amount')
+    due_date = request.form.get('due_date')
+    if not all([student_id, fee_type, amount, due_date]):
+        flash('All fields are required!', 'error')
+        return redirect(url_for('portal.fees'))
+    try:
+        new_fee = Fee(
+            student_id=student_id,
+            fee_type=fee_type,
+            amount=float(amount),
+            due_date=datetime.strptime(due_date, '%Y-%m-%d').date()
+        )
+        db.session.add(new_fee)
+        db.session.commit()
+        flash('Fee added successfully!', 'success')
+    except Exception as e:
+        flash('Error adding fee!', 'error')
+        db.session.rollback()
+    return redirect(url_for('portal.fees'))
+
+@bp.route('/leave_requests')
+def leave_requests():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.index'))
+    
+    user_id = session['user_id']
+    role = session['role']
+    
+    if role == 'parent':
+        students = Student.query.filter_by(parent_id=user_id).all()
+        if not students:
+            return redirect(url_for('auth.index'))
+        selected_student_id = request.args.get('student_id')
+        if not selected_student_id:
+            selected_student_id = str(students[0].id)
+        selected_student = next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+        leave_requests = get_student_leave_requests(selected_student.id)
+        return render_template('leave_requests.html', students=students, selected_student=selected_student, leave_requests=leave_requests)
+    
+    elif role == 'teacher':
+        leave_requests = get_teacher_leave_requests(user_id)
+        return render_template('teacher_leave_requests.html', leave_requests=leave_requests)
+    
+    return redirect(url_for('auth.index'))
+
+# Longest leave a parent may request, in calendar days; approving a leave
+# writes an attendance row per school day
+MAX_LEAVE_DAYS = 31
+
+@bp.route('/submit_leave_request', methods=['POST'])
+def submit_leave_request():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    student = Student.query.filter_by(parent_id=session['user_id']).first()
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    
+    leave_type = request.form.get('leave_type')
+    start_date = request.form.get('start_date')
+    end_date = request.form.get('end_date')
+    reason = request.form.get('reason')
+    
+    if not all([leave_type, start_date, end_date, reason]):
+        flash('All fields are required!', 'error')
+        return redirect(url_for('portal.leave_requests'))
+    
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        flash('Invalid dates!', 'error')
+        return redirect(url_for('portal.leave_requests'))
+    if end_date < start_date:
+        flash('The leave cannot end before it starts!', 'error')
+        return redirect(url_for('portal.leave_requests'))
+    if (end_date - start_date).days + 1 > MAX_LEAVE_DAYS:
+        flash(f'A leave request can cover at most {MAX_LEAVE_DAYS} days!', 'error')
+        return redirect(url_for('portal.leave_requests'))
+    
+    new_leave = LeaveRequest(
+        student_id=student.id,
+        parent_id=session['user_id'],
+        teacher_id=student.teacher_id,
+        leave_type=leave_type,
+        start_date=start_date,
+        end_date=end_date,
+        reason=reason
+    )
+    
+    db.session.add(new_leave)
+    db.session.commit()
+    
+    flash('Leave request submitted successfully!', 'success')
+    return redirect(url_for('portal.leave_requests'))
+
+@bp.route('/update_leave_status', methods=['POST'])
+def update_leave_status():
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    leave_id = request.form.get('leave_id')
+    status = request.form.get('status')
+    comment = request.form.get('comment', '')
+    
+    if not leave_id or not status:
+        flash('Missing required fields!', 'error')
+        return redirect(url_for('portal.leave_requests'))
+    
+    leave_request = LeaveRequest.query.get(leave_id)
+    if leave_request and leave_request.teacher_id == session['user_id']:
+        newly_approved = status == 'approved' and leave_request.status != 'approved'
+        withdrawn = status != 'approved' and leave_request.status == 'approved'
+        leave_request.status = status
+        leave_request.teacher_comment = comment
+        # Record the leave days as absent in the same transaction, or remove
+        # those records again if the approval is withdrawn
+        if newly_approved:
+            apply_leave_attendance(leave_request)
+        elif withdrawn:
+            delete_with_changes(Attendance.query.filter_by(leave_request_id=leave_request.id))
+        db.session.commit()
+        
+        flash('Leave request status updated!', 'success')
+    else:
+        flash('Leave request not found or unauthorized!', 'error')
+    
+    return redirect(url_for('portal.leave_requests'))
+
+# Days of the week without classes (Monday is 0); no attendance is recorded
+NON_SCHOOL_WEEKDAYS = {6}
+
+def leave_school_days(leave_request):
+    day = leave_request.start_date
+    while day <= leave_request.end_date:
+        if day.weekday() not in NON_SCHOOL_WEEKDAYS:
+            yield day
+        day += timedelta(days=1)
+
+def apply_leave_attendance(leave_request):
+    """Add all-absent attendance for the school days of an approved leave.
+
+    Days that already have attendance keep it, since the teacher marked
+    what actually happened. The new rows point back at the leave until a
+    teacher marks them, so they can be removed if the approval is withdrawn. The new rows are written with one multi-row
+    insert in the current transaction; the caller commits.
+    """
+    days = list(leave_school_days(leave_request))
+    if not days:
+        return 0
+    recorded = {day for (day,) in db.session.query(Attendance.date).filter(
+        Attendance.student_id == leave_request.student_id,
+        Attendance.date >= days[0],
+        Attendance.date <= days[-1]
+    )}
+    missing = [day for day in days if day not in recorded]
+    if missing:
+        now = datetime.utcnow()
+        insert_with_changes(Attendance, [
+            dict({f'hour_{hour}': False for hour in range(1, 9)},
+                 student_id=leave_request.student_id, date=day, created_at=now,
+                 leave_request_id=leave_request.id)
+            for day in missing
+        ])
+    return len(missing)
+
+HISTORY_KINDS = ('attendance', 'grade', 'leave_request', 'message')
+
+def name_message_users(rows):
+    """Add sender and receiver usernames to archived message rows"""
+    user_ids = {row['sender_id'] for row in rows} | {row['receiver_id'] for row in rows}
+    names = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids))) if user_ids else {}
+    for row in rows:
+        row['sender'] = names.get(row['sender_id'], 'unknown')
+        row['receiver'] = names.get(row['receiver_id'], 'unknown')
+
+def parent_history_student(students):
+    selected_student_id = request.args.get('student_id')
+    return next((s for s in students if str(s.id) == str(selected_student_id)), students[0])
+
+@bp.route('/history')
+def history():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return redirect(url_for('auth.index'))
+    students = Student.query.filter_by(parent_id=session['user_id']).all()
+    if not students:
+        return redirect(url_for('auth.index'))
+    selected_student = parent_history_student(students)
+    years = list_archived_years(archive_dir())
+    selected_year = request.args.get('year') or (years[0] if years else None)
+    records = {kind: [] for kind in HISTORY_KINDS}
+    if selected_year in years:
+        store = archive_store(parse_academic_year(selected_year))
+        for table in records:
+            records[table] = store.read(table, selected_student.id)
+        store.close()
+        for row in records['attendance']:
+            row['hours'] = unpack_hours(row['hours'])
+        name_message_users(records['message'])
+    return render_template('history.html', students=students, selected_student=selected_student,
+                           years=years, selected_year=selected_year, records=records)
+
+@bp.route('/history/export')
+def history_export():
+    if 'user_id' not in session or session['role'] != 'parent':
+        return redirect(url_for('auth.index'))
+    students = Student.query.filter_by(parent_id=session['user_id']).all()
+    if not students:
+        return redirect(url_for('auth.index'))
+    selected_student = parent_history_student(students)
+    start_year = parse_academic_year(request.args.get('year', ''))
+    kind = request.args.get('kind', 'attendance')
+    if start_year is None or kind not in HISTORY_KINDS:
+        abort(404)
+    store = archive_store(start_year)
+    if not store.exists():
+        abort(404)
+    rows = store.read(kind, selected_student.id)
+    store.close()
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    if kind == 'attendance':
+        writer.writerow(['date'] + [f'hour_{h}' for h in range(1, 9)])
+        for row in rows:
+            writer.writerow([row['date']] + ['present' if p else 'absent' for p in unpack_hours(row['hours'])])
+    elif kind == 'message':
+        name_message_users(rows)
+        writer.writerow(['timestamp', 'from', 'to', 'content', 'is_read'])
+        for row in rows:
+            writer.writerow([row['timestamp'], row['sender'], row['receiver'], row['content'], row['is_read']])
+    else:
+        columns = [c for c in rows[0].keys() if c not in ('id', 'student_id', 'parent_id', 'teacher_id')] if rows else []
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row[c] for c in columns])
+    filename = f'{selected_student.student_id}_{kind}_{academic_year_label(start_year)}.csv'
+    response = current_app.response_class(output.getvalue(), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
@@ -0,0 +1,7 @@
+"""WSGI entry point, e.g. ``gunicorn -w 4 wsgi:app``.
+
+EDUTRACK_SECRET_KEY must be set; the app refuses to start without it.
+"""
+from app import create_app
+
+app = create_app()